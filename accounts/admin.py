@@ -1,10 +1,16 @@
 from django.contrib import admin
-from .models import UserProfile
+from .models import Region, UserProfile
 
 # Register your models here.
 
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind')
+    list_filter = ('kind',)
+    search_fields = ('name',)
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'state', 'country')
-    list_filter = ('country', 'state')
+    list_filter = ('country_region', 'state_region')
     search_fields = ('user__username', 'state', 'country')
@@ -3,7 +3,8 @@ from django.contrib.auth.models import User
 from django.forms.utils import ErrorList
 from django.utils.safestring import mark_safe
 from django import forms
-from .models import UserProfile
+from . import regions
+from .models import Region, UserProfile
 
 class CustomErrorList(ErrorList):
     def __str__(self):
@@ -15,7 +16,15 @@ class CustomErrorList(ErrorList):
             )
         )
 
-class LocationForm(forms.Form):
+class CanonicalLocationMixin:
+    """Normalizes state/country ("CA", " california") to the names regions are stored under."""
+    def clean_state(self):
+        return regions.canonical_name(regions.STATE, self.cleaned_data['state'])
+
+    def clean_country(self):
+        return regions.canonical_name(regions.COUNTRY, self.cleaned_data['country'])
+
+class LocationForm(CanonicalLocationMixin, forms.Form):
     state = forms.CharField(
         max_length=100, 
         required=True,
@@ -27,7 +36,7 @@ class LocationForm(forms.Form):
         widget=forms.TextInput(attrs={'class': 'form-control'})
     )
 
-class CustomUserCreationForm(UserCreationForm):
+class CustomUserCreationForm(CanonicalLocationMixin, UserCreationForm):
     state = forms.CharField(
         max_length=100, 
         required=True,
@@ -55,7 +64,10 @@ class CustomUserCreationForm(UserCreationForm):
             user.save()
             # Create or update the user profile with location data
             profile, created = UserProfile.objects.get_or_create(user=user)
-            profile.state = self.cleaned_data['state']
-            profile.country = self.cleaned_data['country']
+            profile.state_region, profile.country_region = Region.resolve_location(
+                self.cleaned_data['state'], self.cleaned_data['country']
+            )
+            profile.state = profile.state_region.name if profile.state_region else self.cleaned_data['state']
+            profile.country = profile.country_region.name if profile.country_region else self.cleaned_data['country']
             profile.save()
         return user
\ No newline at end of file
@@ -0,0 +1,113 @@
+# Generated by Django 5.0 on 2026-10-18 13:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# A frozen copy of accounts/regions.py as of this migration, so later
+# changes to the live aliases don't change what migrating a database does.
+# cart 0011 reuses it for orders.
+STATE = 'state'
+COUNTRY = 'country'
+
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota',
+    'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia',
+    'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+COUNTRY_ALIASES = {
+    'us': 'United States', 'u.s.': 'United States', 'usa': 'United States',
+    'u.s.a.': 'United States', 'united states of america': 'United States', 'america': 'United States',
+    'uk': 'United Kingdom', 'u.k.': 'United Kingdom', 'gb': 'United Kingdom',
+    'great britain': 'United Kingdom', 'england': 'United Kingdom',
+}
+ALIASES = {
+    STATE: {
+        **{code.casefold(): name for code, name in US_STATES.items()},
+        **{name.casefold(): name for name in US_STATES.values()},
+        'washington dc': 'District of Columbia', 'washington d.c.': 'District of Columbia',
+    },
+    COUNTRY: {
+        **COUNTRY_ALIASES,
+        **{name.casefold(): name for name in COUNTRY_ALIASES.values()},
+    },
+}
+
+
+def canonical_name(kind, value):
+    cleaned = ' '.join((value or '').split())
+    return ALIASES[kind].get(cleaned.casefold(), cleaned)
+
+
+def region_key(kind, value):
+    return canonical_name(kind, value).casefold()
+
+
+def resolve(Region, kind, values):
+    """Return {value: Region} for the non-blank values, creating missing regions."""
+    keys = {value: region_key(kind, value) for value in values if region_key(kind, value)}
+    if not keys:
+        return {}
+    regions = {region.key: region for region in Region.objects.filter(kind=kind, key__in=set(keys.values()))}
+    missing = {key: value for value, key in keys.items() if key not in regions}
+    if missing:
+        Region.objects.bulk_create(
+            [Region(kind=kind, key=key, name=canonical_name(kind, value)) for key, value in missing.items()],
+            ignore_conflicts=True,
+        )
+        regions.update(
+            (region.key, region) for region in Region.objects.filter(kind=kind, key__in=list(missing))
+        )
+    return {value: regions[key] for value, key in keys.items()}
+
+
+def backfill(Region, Model):
+    """Point Model.state_region/country_region at Regions and rewrite state/country canonically."""
+    for kind in (STATE, COUNTRY):
+        spellings = Model.objects.exclude(**{kind: None}).order_by().values_list(kind, flat=True).distinct()
+        for value, region in resolve(Region, kind, list(spellings)).items():
+            Model.objects.filter(**{kind: value}).update(**{kind: region.name, f'{kind}_region': region})
+
+
+def backfill_profile_regions(apps, schema_editor):
+    backfill(apps.get_model('accounts', 'Region'), apps.get_model('accounts', 'UserProfile'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('state', 'State'), ('country', 'Country')], max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('name', models.CharField(max_length=100)),
+            ],
+            options={
+                'unique_together': {('kind', 'key')},
+            },
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='country_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.region'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='state_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.region'),
+        ),
+        migrations.RunPython(backfill_profile_regions, migrations.RunPython.noop),
+    ]
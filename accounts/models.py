@@ -3,13 +3,52 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from . import regions
+
 
 # Create your models here.
 
+class Region(models.Model):
+    """A canonical state or country that orders and profiles point at (see accounts/regions.py)."""
+    KIND_CHOICES = [
+        (regions.STATE, 'State'),
+        (regions.COUNTRY, 'Country'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Casefolded canonical name, what spellings are matched on
+    key = models.CharField(max_length=100)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('kind', 'key')
+
+    def __str__(self):
+        return f"{self.kind}: {self.name}"
+
+    @classmethod
+    def resolve(cls, kind, value):
+        """The Region for a free-text value, created if new; None when blank."""
+        return regions.resolve(cls, kind, [value]).get(value)
+
+    @classmethod
+    def name_for(cls, kind, value):
+        """The stored name of value's region without creating it; '' when blank, None when there is none."""
+        key = regions.region_key(kind, value)
+        if not key:
+            return ''
+        return cls.objects.filter(kind=kind, key=key).values_list('name', flat=True).first()
+
+    @classmethod
+    def resolve_location(cls, state, country):
+        return cls.resolve(regions.STATE, state), cls.resolve(regions.COUNTRY, country)
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     state = models.CharField(max_length=100, blank=True, null=True)
     country = models.CharField(max_length=100, default='United States')
+    state_region = models.ForeignKey(Region, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    country_region = models.ForeignKey(Region, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
     
     def __str__(self):
         return f"{self.user.username}'s Profile"
@@ -0,0 +1,76 @@
+"""Normalize free-text states and countries to canonical Region rows.
+
+"CA", "california" and "California " all resolve to the same Region, so
+orders and profiles group on one integer key per region. Anything without an
+alias is matched case- and whitespace-insensitively and keeps the spelling it
+was first entered with.
+"""
+STATE = 'state'
+COUNTRY = 'country'
+
+US_STATES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'RI': 'Rhode Island', 'SC': 'South Carolina', 'SD': 'South Dakota',
+    'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont', 'VA': 'Virginia',
+    'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming',
+}
+COUNTRY_ALIASES = {
+    'us': 'United States', 'u.s.': 'United States', 'usa': 'United States',
+    'u.s.a.': 'United States', 'united states of america': 'United States', 'america': 'United States',
+    'uk': 'United Kingdom', 'u.k.': 'United Kingdom', 'gb': 'United Kingdom',
+    'great britain': 'United Kingdom', 'england': 'United Kingdom',
+}
+
+# kind: {casefolded spelling: canonical name}
+ALIASES = {
+    STATE: {
+        **{code.casefold(): name for code, name in US_STATES.items()},
+        **{name.casefold(): name for name in US_STATES.values()},
+        'washington dc': 'District of Columbia', 'washington d.c.': 'District of Columbia',
+    },
+    COUNTRY: {
+        **COUNTRY_ALIASES,
+        **{name.casefold(): name for name in COUNTRY_ALIASES.values()},
+    },
+}
+
+
+def canonical_name(kind, value):
+    """The spelling to show and store for value ('' when blank)."""
+    cleaned = ' '.join((value or '').split())
+    return ALIASES[kind].get(cleaned.casefold(), cleaned)
+
+
+def region_key(kind, value):
+    """What Region.key stores: the canonical name, casefolded."""
+    return canonical_name(kind, value).casefold()
+
+
+def resolve(Region, kind, values):
+    """Return {value: Region} for the non-blank values, creating missing regions in bulk.
+
+    Takes the model class because accounts.models imports this module.
+    """
+    keys = {value: region_key(kind, value) for value in values if region_key(kind, value)}
+    if not keys:
+        return {}
+    regions = {region.key: region for region in Region.objects.filter(kind=kind, key__in=set(keys.values()))}
+    missing = {key: value for value, key in keys.items() if key not in regions}
+    if missing:
+        # ignore_conflicts: another request may be creating the same region
+        Region.objects.bulk_create(
+            [Region(kind=kind, key=key, name=canonical_name(kind, value)) for key, value in missing.items()],
+            ignore_conflicts=True,
+        )
+        regions.update(
+            (region.key, region) for region in Region.objects.filter(kind=kind, key__in=list(missing))
+        )
+    return {value: regions[key] for value, key in keys.items()}
+
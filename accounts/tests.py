@@ -1,3 +1,93 @@
+import importlib
+
+from django.apps import apps
+from django.contrib.auth.models import User
 from django.test import TestCase
 
+from cart.models import Order, RegionalSales
+from movies.models import Movie
+
+from . import regions
+from .forms import LocationForm
+from .models import Region
+
 # Create your tests here.
+
+
+class RegionResolutionTests(TestCase):
+    def test_aliases_and_spellings_share_one_canonical_name(self):
+        for spelling in ['CA', 'ca', 'california', '  California ', 'CALIFORNIA']:
+            with self.subTest(spelling=spelling):
+                self.assertEqual(regions.canonical_name(regions.STATE, spelling), 'California')
+        for spelling in ['US', 'u.s.a.', 'United States of America', 'united states']:
+            with self.subTest(spelling=spelling):
+                self.assertEqual(regions.canonical_name(regions.COUNTRY, spelling), 'United States')
+        self.assertEqual(regions.canonical_name(regions.STATE, 'washington dc'), 'District of Columbia')
+
+    def test_unknown_values_keep_their_spelling_but_match_loosely(self):
+        self.assertEqual(regions.canonical_name(regions.STATE, ' New   South Wales '), 'New South Wales')
+        self.assertEqual(
+            regions.region_key(regions.STATE, 'new south wales'),
+            regions.region_key(regions.STATE, 'New South Wales'),
+        )
+        self.assertEqual(regions.canonical_name(regions.STATE, None), '')
+
+    def test_resolve_creates_each_region_once(self):
+        found = regions.resolve(Region, regions.STATE, ['TX', 'texas', 'Ontario', ''])
+        self.assertEqual(set(found), {'TX', 'texas', 'Ontario'})
+        self.assertEqual(found['TX'], found['texas'])
+        self.assertEqual(found['TX'].name, 'Texas')
+        self.assertEqual(Region.resolve(regions.STATE, 'Texas '), found['TX'])
+        self.assertEqual(Region.objects.filter(kind=regions.STATE).count(), 2)
+        self.assertIsNone(Region.resolve(regions.COUNTRY, ''))
+
+    def test_name_for_looks_up_without_creating(self):
+        Region.resolve(regions.STATE, 'Ontario')
+        self.assertEqual(Region.name_for(regions.STATE, 'ONTARIO'), 'Ontario')
+        self.assertEqual(Region.name_for(regions.STATE, ' '), '')
+        self.assertIsNone(Region.name_for(regions.STATE, 'Atlantis'))
+        self.assertEqual(Region.objects.count(), 1)
+
+    def test_same_name_is_a_different_region_per_kind(self):
+        state, country = Region.resolve_location('Georgia', 'Georgia')
+        self.assertNotEqual(state, country)
+
+    def test_location_form_normalizes(self):
+        form = LocationForm({'state': 'ny', 'country': 'usa'})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data, {'state': 'New York', 'country': 'United States'})
+
+
+class OrderRegionMigrationTests(TestCase):
+    """cart 0011's backfill, run against the current models."""
+    databases = {'default', 'cache'}
+
+    migration = importlib.import_module('cart.migrations.0011_order_regions')
+
+    def test_folds_rollups_under_other_spellings_into_the_canonical_row(self):
+        user = User.objects.create_user('buyer', password='secret')
+        movie = Movie.objects.create(name='Heat', price=10, description='Heist')
+        # Orders and rollups as free-text checkout used to leave them
+        for state in ['ca', 'California ', 'Ontario']:
+            Order.objects.create(user=user, total=10, state=state, country='usa')
+        RegionalSales.objects.bulk_create([
+            RegionalSales(scope='state', region='ca', movie=movie, quantity=2),
+            RegionalSales(scope='state', region='California', movie=movie, quantity=3),
+            RegionalSales(scope='state', region='Ontario', movie=movie, quantity=1),
+            RegionalSales(scope='country', region='usa', movie=movie, quantity=6),
+            RegionalSales(scope='overall', region='', movie=movie, quantity=6),
+        ])
+
+        self.migration.backfill_order_regions(apps, None)
+
+        self.assertEqual(
+            sorted(RegionalSales.objects.values_list('scope', 'region', 'quantity')),
+            [('country', 'United States', 6), ('overall', '', 6), ('state', 'California', 5), ('state', 'Ontario', 1)],
+        )
+        california = Region.objects.get(kind=regions.STATE, key='california')
+        self.assertEqual(
+            sorted(Order.objects.values_list('state', 'state_region')),
+            [('California', california.id), ('California', california.id),
+             ('Ontario', Region.objects.get(key='ontario').id)],
+        )
+        self.assertEqual(set(Order.objects.values_list('country', flat=True)), {'United States'})
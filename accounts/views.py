@@ -3,6 +3,11 @@ from django.contrib.auth import login as auth_login, authenticate, logout as aut
 from .forms import CustomUserCreationForm, CustomErrorList
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.db.models import F, Prefetch
+from cart.models import Item
+from moviesstore.pagination import paginate
+
+ORDERS_PER_PAGE = 10
 
 # Create your views here.
 
@@ -45,6 +50,17 @@ def logout(request):
 def orders(request):
     template_data = {}
     template_data['title'] = 'Orders'
-    template_data['orders'] = request.user.order_set.all()
+    orders = (
+        request.user.order_set.order_by('-date', '-id')
+        .prefetch_related(Prefetch(
+            'item_set',
+            queryset=Item.objects.select_related('movie')
+                .annotate(line_total=F('price') * F('quantity'))
+                .order_by('id'),
+        ))
+    )
+    page = paginate(orders, request, page_size=ORDERS_PER_PAGE)
+    template_data['orders'] = page.items
+    template_data['page'] = page
     return render(request, 'accounts/orders.html',
         {'template_data': template_data})
\ No newline at end of file
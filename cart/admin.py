@@ -1,6 +1,18 @@
 from django.contrib import admin
-from .models import Order, Item
+from .models import Order, Item, RegionalSales, TrendingScore
 
 # Register your models here.
 admin.site.register(Order)
 admin.site.register(Item)
+
+@admin.register(RegionalSales)
+class RegionalSalesAdmin(admin.ModelAdmin):
+    list_display = ('scope', 'region', 'movie', 'quantity')
+    list_filter = ('scope',)
+    search_fields = ('region', 'movie__name')
+
+@admin.register(TrendingScore)
+class TrendingScoreAdmin(admin.ModelAdmin):
+    list_display = ('window', 'scope', 'region', 'movie', 'score')
+    list_filter = ('window', 'scope')
+    search_fields = ('region', 'movie__name')
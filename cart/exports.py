@@ -0,0 +1,122 @@
+"""Stream order lines (Order x Item x Movie) as CSV or NDJSON.
+
+Rows are read with .iterator() and written out a chunk at a time, so memory
+stays flat however many orders match. Used by the staff export view and the
+export_sales command.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounts import regions
+
+from .models import Item
+
+# (column, Item lookup)
+COLUMNS = [
+    ('order_id', 'order_id'),
+    ('order_date', 'order__date'),
+    ('state', 'order__state'),
+    ('country', 'order__country'),
+    ('user_id', 'order__user_id'),
+    ('movie_id', 'movie_id'),
+    ('movie', 'movie__name'),
+    ('quantity', 'quantity'),
+    ('price', 'price'),
+]
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+CHUNK_SIZE = 2000
+
+
+def parse_filters(data):
+    """Read state/country/start/end (YYYY-MM-DD, inclusive) from a dict; raises ValueError."""
+    filters = {}
+    for field in ('state', 'country'):
+        if data.get(field):
+            filters[field] = data[field]
+    for field in ('start', 'end'):
+        if data.get(field):
+            value = parse_date(data[field])
+            if value is None:
+                raise ValueError(f'{field} must be a date (YYYY-MM-DD)')
+            filters[field] = value
+    return filters
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def export_rows(state=None, country=None, start=None, end=None):
+    items = Item.objects.all()
+    # Through the orders' region keys, so "CA" and "California" export the same rows
+    if state:
+        items = items.filter(order__state_region__kind=regions.STATE,
+                             order__state_region__key=regions.region_key(regions.STATE, state))
+    if country:
+        items = items.filter(order__country_region__kind=regions.COUNTRY,
+                             order__country_region__key=regions.region_key(regions.COUNTRY, country))
+    if start:
+        items = items.filter(order__date__gte=_day_start(start))
+    if end:
+        items = items.filter(order__date__lt=_day_start(end + timedelta(days=1)))
+    # Matches the Item(order, movie) index, so unfiltered exports stream without a sort
+    return items.order_by('order_id', 'movie_id').values_list(*[lookup for _, lookup in COLUMNS])
+
+
+class _Echo:
+    """File-like object whose write() hands back what csv.writer gives it."""
+    def write(self, value):
+        return value
+
+
+def _chunks(rows):
+    chunk = []
+    for row in rows.iterator(chunk_size=CHUNK_SIZE):
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([column for column, _ in COLUMNS])
+    for chunk in _chunks(rows):
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+def render_ndjson(rows):
+    names = [column for column, _ in COLUMNS]
+    for chunk in _chunks(rows):
+        yield ''.join(
+            json.dumps(dict(zip(names, row)), default=datetime.isoformat) + '\n' for row in chunk
+        )
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'ndjson': render_ndjson,
+}
+
+
+def encode(chunks, compress=False):
+    """UTF-8 encode the text chunks, gzipping them on the fly when compress is true."""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        # Sync-flush every chunk so compressed bytes go out as rows are read
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cart.exports import FORMATS, RENDERERS, encode, export_rows, parse_filters
+
+
+class Command(BaseCommand):
+    help = 'Stream order lines (order, item, movie) as CSV or NDJSON, optionally gzipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--state')
+        parser.add_argument('--country')
+        parser.add_argument('--start', help='First order date, YYYY-MM-DD')
+        parser.add_argument('--end', help='Last order date (inclusive), YYYY-MM-DD')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            filters = parse_filters(options)
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        chunks = encode(RENDERERS[options['format']](export_rows(**filters)), options['gzip'])
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from cart.models import TrendingScore
+
+
+class Command(BaseCommand):
+    help = 'Roll the 24h/7d/30d trending windows forward (run hourly), or rebuild them from history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Recompute every bucket and score from Order/Item history')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rows = TrendingScore.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} trending score(s)'))
+        else:
+            rows = TrendingScore.roll_forward()
+            self.stdout.write(self.style.SUCCESS(f'Rolled forward {rows} trending score(s)'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.0 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+
+
+def backfill_regional_sales(apps, schema_editor):
+    Item = apps.get_model('cart', 'Item')
+    RegionalSales = apps.get_model('cart', 'RegionalSales')
+    totals = {}
+    rows = (
+        Item.objects.values('order__state', 'order__country', 'movie_id')
+        .annotate(quantity=Sum('quantity'))
+    )
+    for row in rows:
+        keys = [('overall', '')]
+        if row['order__state']:
+            keys.append(('state', row['order__state']))
+        if row['order__country']:
+            keys.append(('country', row['order__country']))
+        for scope, region in keys:
+            key = (scope, region, row['movie_id'])
+            totals[key] = totals.get(key, 0) + row['quantity']
+    RegionalSales.objects.bulk_create(
+        [
+            RegionalSales(scope=scope, region=region, movie_id=movie_id, quantity=quantity)
+            for (scope, region, movie_id), quantity in totals.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0003_order_country_order_state'),
+        ('movies', '0004_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RegionalSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('state', 'State'), ('country', 'Country'), ('overall', 'Overall')], max_length=10)),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('quantity', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='regional_sales', to='movies.movie')),
+            ],
+            options={
+                'verbose_name_plural': 'regional sales',
+                'indexes': [models.Index(fields=['scope', 'region', '-quantity'], name='cart_sales_top_idx')],
+                'unique_together': {('scope', 'region', 'movie')},
+            },
+        ),
+        migrations.RunPython(backfill_regional_sales, migrations.RunPython.noop),
+    ]
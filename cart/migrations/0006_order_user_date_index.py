@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 12:53
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0005_order_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-date', '-id'], name='cart_order_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,160 @@
+# Generated by Django 5.0 on 2026-10-18 13:00
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+# A frozen copy of cart/trending.py's rebuild as of cart 0011 (which reuses
+# it with Region), so later changes to the live code don't change what
+# migrating a database does.
+WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+HOT = 'hot'
+
+
+def floor_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def growth(hour, epoch):
+    half_life = timedelta(hours=getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72))
+    return 2 ** ((hour - epoch) / half_life)
+
+
+def regions_for(state, country):
+    regions = [('overall', '')]
+    if state:
+        regions.append(('state', state))
+    if country:
+        regions.append(('country', country))
+    return regions
+
+
+def rebuild_trending(SalesBucket, TrendingScore, TrendingClock, Item, Region=None):
+    """Recompute buckets, scores and clocks from Item/Order history.
+
+    With Region, sales are grouped on the orders' region keys; without it, on
+    the free-text state/country fields.
+    """
+    now_hour = floor_hour(timezone.now())
+    cutoffs = {window: now_hour - length for window, length in WINDOWS.items()}
+    oldest = min(cutoffs.values())
+
+    SalesBucket.objects.all().delete()
+    TrendingScore.objects.all().delete()
+    TrendingClock.objects.all().delete()
+
+    if Region is None:
+        location, names = ('order__state', 'order__country'), None
+    else:
+        location = ('order__state_region', 'order__country_region')
+        names = dict(Region.objects.values_list('id', 'name'))
+    buckets = {}
+    scores = {}
+    rows = (
+        Item.objects.annotate(hour=TruncHour('order__date'))
+        .values(*location, 'movie_id', 'hour')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    for row in rows.iterator(chunk_size=2000):
+        hour, quantity = row['hour'], row['quantity']
+        state, country = row[location[0]], row[location[1]]
+        if names is not None:
+            state, country = names.get(state), names.get(country)
+        for scope, region in regions_for(state, country):
+            key = (scope, region, row['movie_id'])
+            if hour >= oldest:
+                bucket_key = key + (hour,)
+                buckets[bucket_key] = buckets.get(bucket_key, 0) + quantity
+            for window, cutoff in cutoffs.items():
+                if hour >= cutoff:
+                    scores[key + (window,)] = scores.get(key + (window,), 0) + quantity
+            hot_key = key + (HOT,)
+            scores[hot_key] = scores.get(hot_key, 0) + quantity * growth(hour, now_hour)
+
+    SalesBucket.objects.bulk_create(
+        [
+            SalesBucket(scope=scope, region=region, movie_id=movie_id, hour=hour, quantity=quantity)
+            for (scope, region, movie_id, hour), quantity in buckets.items()
+        ],
+        batch_size=1000,
+    )
+    TrendingScore.objects.bulk_create(
+        [
+            TrendingScore(scope=scope, region=region, movie_id=movie_id, window=window, score=score)
+            for (scope, region, movie_id, window), score in scores.items()
+        ],
+        batch_size=1000,
+    )
+    TrendingClock.objects.bulk_create(
+        [TrendingClock(window=window, cutoff=cutoff) for window, cutoff in cutoffs.items()]
+        + [TrendingClock(window=HOT, cutoff=now_hour)]
+    )
+
+
+def backfill_trending(apps, schema_editor):
+    rebuild_trending(
+        apps.get_model('cart', 'SalesBucket'),
+        apps.get_model('cart', 'TrendingScore'),
+        apps.get_model('cart', 'TrendingClock'),
+        apps.get_model('cart', 'Item'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0006_order_user_date_index'),
+        ('movies', '0006_movie_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingClock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('24h', 'Last 24 hours'), ('7d', 'Last 7 days'), ('30d', 'Last 30 days'), ('hot', 'Hot right now')], max_length=10, unique=True)),
+                ('cutoff', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SalesBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('state', 'State'), ('country', 'Country'), ('overall', 'Overall')], max_length=10)),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('hour', models.DateTimeField()),
+                ('quantity', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_buckets', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='cart_bucket_hour_idx')],
+                'unique_together': {('scope', 'region', 'movie', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('state', 'State'), ('country', 'Country'), ('overall', 'Overall')], max_length=10)),
+                ('region', models.CharField(blank=True, default='', max_length=100)),
+                ('window', models.CharField(choices=[('24h', 'Last 24 hours'), ('7d', 'Last 7 days'), ('30d', 'Last 30 days'), ('hot', 'Hot right now')], max_length=10)),
+                ('score', models.FloatField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_scores', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'region', 'window', '-score'], name='cart_trending_top_idx')],
+                'unique_together': {('scope', 'region', 'window', 'movie')},
+            },
+        ),
+        migrations.RunPython(backfill_trending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 13:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0007_trending_windows'),
+        ('movies', '0007_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(fields=['order', 'movie'], name='cart_item_order_movie_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['state'], name='cart_order_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['country'], name='cart_order_country_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0 on 2026-10-18 13:10
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0008_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['date'], name='cart_order_date_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cart', '0009_order_date_index'),
+        ('movies', '0007_query_plan_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.IntegerField(default=0)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='movies.movie')),
+                ('other', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['movie', '-count', 'other'], name='cart_copurchase_top_idx')],
+                'unique_together': {('movie', 'other')},
+            },
+        ),
+    ]
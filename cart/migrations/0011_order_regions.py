@@ -0,0 +1,78 @@
+# Generated by Django 5.0 on 2026-10-18 13:22
+
+import importlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+# The alias tables and trending rebuild frozen in those migrations
+regions = importlib.import_module('accounts.migrations.0002_region')
+trending = importlib.import_module('cart.migrations.0007_trending_windows')
+
+
+def backfill_order_regions(apps, schema_editor):
+    Region = apps.get_model('accounts', 'Region')
+    regions.backfill(Region, apps.get_model('cart', 'Order'))
+
+    # Fold regional totals kept under other spellings into the canonical rows
+    RegionalSales = apps.get_model('cart', 'RegionalSales')
+    names = {(region.kind, region.key): region.name for region in Region.objects.all()}
+    totals = {}
+    stale = []
+    for row in RegionalSales.objects.exclude(scope='overall').iterator(chunk_size=2000):
+        name = names.get((row.scope, regions.region_key(row.scope, row.region)), row.region)
+        if name != row.region:
+            stale.append(row.id)
+            key = (row.scope, name, row.movie_id)
+            totals[key] = totals.get(key, 0) + row.quantity
+    for start in range(0, len(stale), 500):
+        RegionalSales.objects.filter(id__in=stale[start:start + 500]).delete()
+    RegionalSales.objects.bulk_create(
+        [RegionalSales(scope=scope, region=region, movie_id=movie_id) for scope, region, movie_id in totals],
+        ignore_conflicts=True,
+        batch_size=500,
+    )
+    for (scope, region, movie_id), quantity in totals.items():
+        RegionalSales.objects.filter(scope=scope, region=region, movie_id=movie_id).update(
+            quantity=F('quantity') + quantity
+        )
+
+    trending.rebuild_trending(
+        apps.get_model('cart', 'SalesBucket'),
+        apps.get_model('cart', 'TrendingScore'),
+        apps.get_model('cart', 'TrendingClock'),
+        apps.get_model('cart', 'Item'),
+        Region=Region,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_region'),
+        ('cart', '0010_copurchase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='country_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.region'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='state_region',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='accounts.region'),
+        ),
+        migrations.RunPython(backfill_order_regions, migrations.RunPython.noop),
+        # Dropped only now: the backfill above updates orders by their state/country text
+        migrations.RemoveIndex(
+            model_name='order',
+            name='cart_order_state_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='cart_order_country_idx',
+        ),
+    ]
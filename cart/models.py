@@ -1,7 +1,16 @@
-from django.db import models
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connection, models, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
 
+from accounts.models import Region
 from movies.models import Movie
+from . import trending
 
 # Create your models here.
 
@@ -12,6 +21,18 @@ class Order(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     state = models.CharField(max_length=50, blank=True, null=True)
     country = models.CharField(max_length=50, blank=True, null=False)
+    # Canonical regions the state/country text resolved to; group and filter on these
+    state_region = models.ForeignKey(Region, on_delete=models.PROTECT, blank=True, null=True, related_name='+')
+    country_region = models.ForeignKey(Region, on_delete=models.PROTECT, blank=True, null=True, related_name='+')
+    # Client-generated token from the checkout form; repeats of it map to this order
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+
+    class Meta:
+        unique_together = ('user', 'idempotency_key')
+        indexes = [
+            models.Index(fields=['user', '-date', '-id'], name='cart_order_user_date_idx'),
+            models.Index(fields=['date'], name='cart_order_date_idx'),
+        ]
     
     def __str__(self):
         return str(self.id) + ' - ' + self.user.username
@@ -23,6 +44,367 @@ class Item(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'movie'], name='cart_item_order_movie_idx'),
+        ]
+
     def __str__(self):
         return str(self.id) + ' - ' + self.movie.name
-    
\ No newline at end of file
+
+class RegionalSales(models.Model):
+    """Running total of units sold per (region, movie), kept up to date at checkout.
+
+    `region` holds the canonical Region.name (see accounts/regions.py) rather
+    than a Region key: names are unique per kind once normalized, and the
+    trending page and popularity map look regions up by name with no join.
+    SalesBucket and TrendingScore do the same.
+    """
+    SCOPE_STATE = 'state'
+    SCOPE_COUNTRY = 'country'
+    SCOPE_OVERALL = 'overall'
+    SCOPE_CHOICES = [
+        (SCOPE_STATE, 'State'),
+        (SCOPE_COUNTRY, 'Country'),
+        (SCOPE_OVERALL, 'Overall'),
+    ]
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    region = models.CharField(max_length=100, blank=True, default='')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='regional_sales')
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'region', 'movie')
+        indexes = [
+            models.Index(fields=['scope', 'region', '-quantity'], name='cart_sales_top_idx'),
+        ]
+        verbose_name_plural = 'regional sales'
+
+    def __str__(self):
+        return f"{self.scope}:{self.region or '*'} - {self.movie_id} x{self.quantity}"
+
+    @classmethod
+    def record(cls, state, country, quantities):
+        """Add {movie_id: quantity} to every region the sale belongs to.
+
+        Runs a fixed number of queries regardless of cart size: missing rows are
+        created at zero, then every counter is bumped with a single F() update.
+        """
+        quantities = {int(movie_id): int(qty) for movie_id, qty in quantities.items() if int(qty)}
+        if not quantities:
+            return
+        keys = [dict(scope=scope, region=region) for scope, region in trending.regions_for(state, country)]
+        _increment(cls, keys, quantities, 1)
+
+    @classmethod
+    def add_totals(cls, totals):
+        """Add {(scope, region, movie_id): quantity} in bulk; used by backfills."""
+        if not totals:
+            return
+        cls.objects.bulk_create(
+            [cls(scope=scope, region=region, movie_id=movie_id) for scope, region, movie_id in totals],
+            ignore_conflicts=True,
+            batch_size=500,
+        )
+        lookup = Q()
+        for scope, region in {(scope, region) for scope, region, _ in totals}:
+            lookup |= Q(scope=scope, region=region)
+        movie_ids = {movie_id for _, _, movie_id in totals}
+        rows = []
+        for row in cls.objects.filter(lookup, movie_id__in=movie_ids).only('id', 'scope', 'region', 'movie_id'):
+            quantity = totals.get((row.scope, row.region, row.movie_id))
+            if quantity:
+                row.quantity = F('quantity') + quantity
+                rows.append(row)
+        cls.objects.bulk_update(rows, ['quantity'], batch_size=500)
+
+    @classmethod
+    def record_order(cls, order, items):
+        quantities = {}
+        for item in items:
+            quantities[item.movie_id] = quantities.get(item.movie_id, 0) + int(item.quantity)
+        cls.record(order.state, order.country, quantities)
+        TrendingScore.record(order.state, order.country, quantities, order.date)
+
+    @classmethod
+    def top_rows(cls, scope, region='', limit=10):
+        return (
+            cls.objects.filter(scope=scope, region=region, quantity__gt=0)
+            .order_by('-quantity', 'movie_id')[:limit]
+        )
+
+    @classmethod
+    def top_movies(cls, scope, region='', limit=10):
+        """Best sellers for a region, with purchase_count set on each Movie."""
+        rows = cls.top_rows(scope, region, limit).select_related('movie')
+        movies = []
+        for row in rows:
+            row.movie.purchase_count = row.quantity
+            movies.append(row.movie)
+        return movies
+
+class SalesBucket(models.Model):
+    """Units sold per (region, movie) in one hour; the source for rolling windows forward."""
+    scope = models.CharField(max_length=10, choices=RegionalSales.SCOPE_CHOICES)
+    region = models.CharField(max_length=100, blank=True, default='')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='sales_buckets')
+    hour = models.DateTimeField()
+    quantity = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'region', 'movie', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='cart_bucket_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.region or '*'} - {self.movie_id} @ {self.hour:%Y-%m-%d %H}h x{self.quantity}"
+
+class TrendingClock(models.Model):
+    """Per-window bookkeeping: buckets before `cutoff` are already out of the window.
+
+    For the hot window, `cutoff` is the forward-decay epoch instead.
+    """
+    window = models.CharField(max_length=10, choices=trending.WINDOW_CHOICES, unique=True)
+    cutoff = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.window} @ {self.cutoff}"
+
+    @classmethod
+    def current(cls, now=None, lock=False):
+        """Return {window: clock}, creating missing clocks as of now."""
+        now_hour = trending.floor_hour(now or timezone.now())
+        queryset = cls.objects.select_for_update() if lock else cls.objects.all()
+        clocks = {clock.window: clock for clock in queryset}
+        missing = [
+            cls(window=window, cutoff=now_hour - length)
+            for window, length in trending.WINDOWS.items()
+            if window not in clocks
+        ]
+        if trending.HOT not in clocks:
+            missing.append(cls(window=trending.HOT, cutoff=now_hour))
+        if missing:
+            cls.objects.bulk_create(missing, ignore_conflicts=True)
+            clocks = {clock.window: clock for clock in queryset.all()}
+        return clocks
+
+class TrendingScore(models.Model):
+    """Sales of a movie in a region within a trending window (or its decayed hot score)."""
+    scope = models.CharField(max_length=10, choices=RegionalSales.SCOPE_CHOICES)
+    region = models.CharField(max_length=100, blank=True, default='')
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='trending_scores')
+    window = models.CharField(max_length=10, choices=trending.WINDOW_CHOICES)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'region', 'window', 'movie')
+        indexes = [
+            models.Index(fields=['scope', 'region', 'window', '-score'], name='cart_trending_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.window} {self.scope}:{self.region or '*'} - {self.movie_id} = {self.score:.2f}"
+
+    @classmethod
+    def record(cls, state, country, quantities, when=None):
+        """Add {movie_id: quantity} sold at `when` to the hourly buckets and window scores."""
+        quantities = {int(movie_id): int(qty) for movie_id, qty in quantities.items() if int(qty)}
+        if not quantities:
+            return
+        # Rolling forward at checkout keeps the trending page read-only. It
+        # waits for the order to commit and runs in its own transaction, so
+        # checkout never holds the write lock through its table-wide
+        # UPDATE/DELETE, and a rolled-back order rolls nothing forward
+        transaction.on_commit(cls.roll_forward_if_due, robust=True)
+        hour = trending.floor_hour(when or timezone.now())
+        clocks = TrendingClock.current()
+        regions = trending.regions_for(state, country)
+        # Backdated sales that are already outside a window don't count towards it
+        weights = {
+            window: 1 for window in trending.WINDOWS if hour >= clocks[window].cutoff
+        }
+        weights[trending.HOT] = trending.growth(hour, clocks[trending.HOT].cutoff)
+
+        if hour >= min(clocks[window].cutoff for window in trending.WINDOWS):
+            _increment(
+                SalesBucket,
+                [dict(scope=scope, region=region, hour=hour) for scope, region in regions],
+                quantities,
+                1,
+            )
+        for window, weight in weights.items():
+            _increment(
+                cls,
+                [dict(scope=scope, region=region, window=window) for scope, region in regions],
+                quantities,
+                weight,
+                field='score',
+            )
+
+    @classmethod
+    def roll_forward(cls, now=None):
+        """Drop sales that have aged out of each window; returns the number of score rows touched."""
+        now = now or timezone.now()
+        now_hour = trending.floor_hour(now)
+        touched = 0
+        with transaction.atomic():
+            clocks = TrendingClock.current(now, lock=True)
+            for window, length in trending.WINDOWS.items():
+                clock = clocks[window]
+                new_cutoff = now_hour - length
+                if new_cutoff <= clock.cutoff:
+                    continue
+                expired = SalesBucket.objects.filter(
+                    scope=OuterRef('scope'),
+                    region=OuterRef('region'),
+                    movie=OuterRef('movie'),
+                    hour__gte=clock.cutoff,
+                    hour__lt=new_cutoff,
+                )
+                expired_total = (
+                    expired.order_by().values('movie').annotate(total=Sum('quantity')).values('total')
+                )
+                touched += cls.objects.filter(window=window).filter(Exists(expired)).update(
+                    score=F('score') - Coalesce(Subquery(expired_total), Value(0))
+                )
+                clock.cutoff = new_cutoff
+                clock.save(update_fields=['cutoff'])
+            cls.objects.filter(window__in=trending.WINDOWS, score__lte=0).delete()
+            SalesBucket.objects.filter(
+                hour__lt=min(clocks[window].cutoff for window in trending.WINDOWS)
+            ).delete()
+
+            hot = clocks[trending.HOT]
+            if now_hour - hot.cutoff > trending.half_life() * trending.REBASE_HALF_LIVES:
+                factor = 1 / trending.growth(now_hour, hot.cutoff)
+                touched += cls.objects.filter(window=trending.HOT).update(score=F('score') * factor)
+                # Sales this decayed are noise; drop them to keep the table small
+                cls.objects.filter(window=trending.HOT, score__lt=1e-3).delete()
+                hot.cutoff = now_hour
+                hot.save(update_fields=['cutoff'])
+        return touched
+
+    @classmethod
+    def roll_forward_if_due(cls):
+        """Roll windows forward at most once an hour across all processes; called after checkout commits."""
+        hour = trending.floor_hour(timezone.now()).isoformat()
+        if cache.get(trending.ROLLED_KEY) != hour:
+            cls.roll_forward()
+            cache.set(trending.ROLLED_KEY, hour, 60 * 60)
+
+    @classmethod
+    def top_rows(cls, scope, region='', window='7d', limit=10):
+        return (
+            cls.objects.filter(scope=scope, region=region, window=window, score__gt=0)
+            .order_by('-score', 'movie_id')[:limit]
+        )
+
+    @classmethod
+    def top_movies(cls, scope, region='', window='7d', limit=10):
+        """Top movies for a region in a window, with purchase_count (or trend_score for hot) set."""
+        rows = cls.top_rows(scope, region, window, limit).select_related('movie')
+        movies = []
+        decay = None
+        for row in rows:
+            if window == trending.HOT:
+                if decay is None:
+                    # Hot scores only exist once record() or rebuild() set the clock
+                    epoch = TrendingClock.objects.get(window=trending.HOT).cutoff
+                    decay = 1 / trending.growth(timezone.now(), epoch)
+                row.movie.trend_score = round(row.score * decay, 1)
+            else:
+                row.movie.purchase_count = round(row.score)
+            movies.append(row.movie)
+        return movies
+
+    @classmethod
+    def rebuild(cls, now=None):
+        return trending.rebuild_trending(SalesBucket, cls, TrendingClock, Item, Region, now)
+
+
+class CoPurchase(models.Model):
+    """How many orders contained both movie and other; one row per direction of each pair.
+
+    A sparse movie x movie matrix built offline from Item (see
+    backfill_aggregates copurchase), read back as "customers also bought".
+    """
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='co_purchases')
+    other = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('movie', 'other')
+        indexes = [
+            models.Index(fields=['movie', '-count', 'other'], name='cart_copurchase_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie_id} + {self.other_id} x{self.count}"
+
+    @classmethod
+    def count_orders(cls, order_ids):
+        """Return {(movie_id, other_id): orders} for the given orders, both directions."""
+        rows = (
+            Item.objects.filter(order_id__in=order_ids)
+            .order_by('order_id')
+            .values_list('order_id', 'movie_id')
+        )
+        pairs = {}
+        for _, group in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+            movie_ids = {movie_id for _, movie_id in group}
+            for movie_id in movie_ids:
+                for other_id in movie_ids:
+                    if movie_id != other_id:
+                        pairs[movie_id, other_id] = pairs.get((movie_id, other_id), 0) + 1
+        return pairs
+
+    @classmethod
+    def add_pairs(cls, pairs):
+        """Add {(movie_id, other_id): count} with one upsert statement per batch.
+
+        Uses INSERT ... ON CONFLICT DO UPDATE (SQLite 3.24+, PostgreSQL):
+        a chunk touches thousands of pairs, and bulk_update() with F()
+        increments spends most of its time compiling the CASE expression.
+        """
+        if not pairs:
+            return
+        table = connection.ops.quote_name(cls._meta.db_table)
+        sql = (
+            f'INSERT INTO {table} (movie_id, other_id, count) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (movie_id, other_id) DO UPDATE SET count = {table}.count + excluded.count'
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (movie_id, other_id, count) for (movie_id, other_id), count in pairs.items()
+            ])
+
+    @classmethod
+    def also_bought(cls, movie, limit=4):
+        """Movies most often bought together with movie, with bought_together set on each."""
+        rows = (
+            cls.objects.filter(movie=movie, count__gt=0)
+            .order_by('-count', 'other_id')
+            .select_related('other')[:limit]
+        )
+        movies = []
+        for row in rows:
+            row.other.bought_together = row.count
+            movies.append(row.other)
+        return movies
+
+
+def _increment(model, keys, quantities, weight, field='quantity'):
+    """Add weight * quantities[movie_id] to `field` of each keys x movie row, creating rows as needed."""
+    model.objects.bulk_create(
+        [model(movie_id=movie_id, **key) for key in keys for movie_id in quantities],
+        ignore_conflicts=True,
+    )
+    lookup = Q()
+    for key in keys:
+        lookup |= Q(**key)
+    rows = list(model.objects.filter(lookup, movie_id__in=quantities).only('id', 'movie_id'))
+    for row in rows:
+        setattr(row, field, F(field) + quantities[row.movie_id] * weight)
+    model.objects.bulk_update(rows, [field])
@@ -1,3 +1,239 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from movies.models import Movie
+
+from . import trending
+from .models import Item, Order, RegionalSales, SalesBucket, TrendingScore
+from .utils import place_order
 
 # Create your tests here.
+
+
+class PlaceOrderTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='secret')
+        cls.movies = [
+            Movie.objects.create(name='Heat', price=10, description='Heist'),
+            Movie.objects.create(name='Ran', price=7, description='Epic'),
+        ]
+        cls.cart = {str(cls.movies[0].id): 2, str(cls.movies[1].id): 1}
+
+    def sales(self, scope, region):
+        return dict(
+            RegionalSales.objects.filter(scope=scope, region=region).values_list('movie_id', 'quantity')
+        )
+
+    def test_writes_order_items_and_rollup(self):
+        order, created = place_order(self.user, self.cart, self.movies, 'ca', 'usa', 'key-1')
+        self.assertTrue(created)
+        self.assertEqual(order.total, 27)
+        self.assertEqual((order.state, order.country), ('California', 'United States'))
+        self.assertEqual(
+            sorted(Item.objects.filter(order=order).values_list('movie_id', 'quantity')),
+            [(self.movies[0].id, 2), (self.movies[1].id, 1)],
+        )
+        self.assertEqual(self.sales('state', 'California'), {self.movies[0].id: 2, self.movies[1].id: 1})
+
+    def test_repeated_key_replays_the_first_order(self):
+        # The second call hits the (user, idempotency_key) constraint, as a
+        # racing double submit would, and gets the first order back
+        first, _ = place_order(self.user, self.cart, self.movies, 'CA', 'US', 'key-1')
+        again, created = place_order(self.user, self.cart, self.movies, 'CA', 'US', 'key-1')
+        self.assertFalse(created)
+        self.assertEqual(again.pk, first.pk)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Item.objects.count(), 2)
+        self.assertEqual(self.sales('overall', ''), {self.movies[0].id: 2, self.movies[1].id: 1})
+
+    def test_orders_without_a_key_are_independent(self):
+        place_order(self.user, self.cart, self.movies, 'CA', 'US')
+        _, created = place_order(self.user, self.cart, self.movies, 'CA', 'US')
+        self.assertTrue(created)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_checkout_resubmit_shows_the_same_order(self):
+        self.client.force_login(self.user)
+        self.client.post(reverse('cart.add', kwargs={'id': self.movies[0].id}), {'quantity': 1})
+        data = {'state': 'Texas', 'country': 'United States', 'idempotency_key': 'form-1'}
+        first = self.client.post(reverse('cart.checkout'), data)
+        second = self.client.post(reverse('cart.checkout'), data)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(Order.objects.filter(user=self.user).count(), 1)
+
+
+class SessionCartTests(TransactionTestCase):
+    databases = {'default', 'cache'}
+
+    def test_concurrent_session_writes_are_never_lost(self):
+        SessionStore = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+
+        def write_cart(worker):
+            session = SessionStore()
+            lost = 0
+            try:
+                for count in range(1, 51):
+                    session['cart'] = {str(worker): count}
+                    session.save()
+                    lost += SessionStore(session.session_key).get('cart') != {str(worker): count}
+            finally:
+                connections.close_all()
+            return lost
+
+        with ThreadPoolExecutor(8) as pool:
+            self.assertEqual(sum(pool.map(write_cart, range(8))), 0)
+
+class TrendingTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name='Heat', price=10, description='Heist')
+
+    def scores(self, scope='overall', region=''):
+        return dict(
+            TrendingScore.objects.filter(scope=scope, region=region).values_list('window', 'score')
+        )
+
+    def test_sale_counts_towards_every_window_and_region(self):
+        TrendingScore.record('California', 'United States', {self.movie.id: 3})
+        scores = self.scores('state', 'California')
+        self.assertEqual({window: scores[window] for window in trending.WINDOWS}, {'24h': 3, '7d': 3, '30d': 3})
+        self.assertAlmostEqual(scores[trending.HOT], 3, delta=0.1)
+        self.assertEqual(self.scores('country', 'United States')['7d'], 3)
+
+    def test_backdated_sale_only_counts_in_windows_it_falls_in(self):
+        TrendingScore.record('', '', {self.movie.id: 2}, timezone.now() - timedelta(days=3))
+        self.assertEqual(
+            {window: score for window, score in self.scores().items() if window in trending.WINDOWS},
+            {'7d': 2, '30d': 2},
+        )
+
+    def test_hot_score_halves_every_half_life(self):
+        TrendingScore.record('', '', {self.movie.id: 10}, timezone.now() - timedelta(hours=72))
+        TrendingScore.record('', '', {self.movie.id: 4}, timezone.now())
+        [movie] = TrendingScore.top_movies('overall', '', trending.HOT)
+        self.assertAlmostEqual(movie.trend_score, 10 * 0.5 + 4, delta=0.2)
+
+    def test_roll_forward_drops_expired_sales(self):
+        now = timezone.now()
+        TrendingScore.record('', '', {self.movie.id: 5}, now)
+        TrendingScore.roll_forward(now + timedelta(hours=25))
+        scores = self.scores()
+        self.assertNotIn('24h', scores)
+        self.assertEqual((scores['7d'], scores['30d']), (5, 5))
+
+        TrendingScore.roll_forward(now + timedelta(days=31))
+        self.assertEqual(set(self.scores()), {trending.HOT})
+        self.assertFalse(SalesBucket.objects.exists())
+
+    def test_rolling_forward_twice_subtracts_once(self):
+        now = timezone.now()
+        TrendingScore.record('', '', {self.movie.id: 5}, now - timedelta(hours=2))
+        TrendingScore.record('', '', {self.movie.id: 1}, now)
+        TrendingScore.roll_forward(now + timedelta(hours=23))
+        TrendingScore.roll_forward(now + timedelta(hours=23))
+        self.assertEqual(self.scores()['24h'], 1)
+
+    def test_checkout_rolls_forward_after_commit_and_the_page_only_reads(self):
+        user = User.objects.create_user('buyer', password='secret')
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(user, {str(self.movie.id): 1}, [self.movie], 'Texas', 'United States')
+            # Not inside the checkout transaction
+            self.assertIsNone(cache.get(trending.ROLLED_KEY))
+        self.assertEqual(cache.get(trending.ROLLED_KEY), trending.floor_hour(timezone.now()).isoformat())
+
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('movies.trending'), {'window': '24h'})
+        self.assertContains(response, 'Heat')
+        writes = [query['sql'] for query in queries if not query['sql'].startswith('SELECT')]
+        self.assertEqual(writes, [])
+
+    def test_rolled_back_checkout_rolls_nothing_forward(self):
+        user = User.objects.create_user('buyer', password='secret')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                place_order(user, {str(self.movie.id): 1}, [self.movie], 'Texas', 'United States')
+                raise RuntimeError('payment failed')
+        self.assertEqual(callbacks, [])
+        self.assertIsNone(cache.get(trending.ROLLED_KEY))
+
+    def test_state_param_matches_the_stored_region_in_any_case(self):
+        user = User.objects.create_user('buyer', password='secret')
+        place_order(user, {str(self.movie.id): 1}, [self.movie], 'Ontario', 'Canada')
+        self.client.force_login(user)
+        response = self.client.get(reverse('movies.trending'), {'state': 'ONTARIO', 'window': '24h'})
+        self.assertContains(response, 'Trending Movies in Ontario')
+        self.assertEqual(response.context['template_data']['movies'][0].name, 'Heat')
+
+
+class ExportTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+        movie = Movie.objects.create(name='Heat', price=10, description='Heist')
+        cls.orders = {}
+        for state, country, day in [
+            ('CA', 'USA', datetime(2026, 1, 5, 12)),
+            ('Texas', 'United States', datetime(2026, 1, 20, 12)),
+            ('', 'uk', datetime(2026, 2, 1, 12)),
+        ]:
+            order, _ = place_order(cls.staff, {str(movie.id): 1}, [movie], state, country)
+            Order.objects.filter(pk=order.pk).update(date=timezone.make_aware(day))
+            cls.orders[state or country] = order.pk
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('cart.export'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def order_ids(self, body):
+        return sorted(int(row['order_id']) for row in csv.DictReader(body.decode().splitlines()))
+
+    def test_filters_by_region_alias_and_inclusive_dates(self):
+        self.assertEqual(self.order_ids(self.export(state='california')), [self.orders['CA']])
+        self.assertEqual(
+            self.order_ids(self.export(country='US')), sorted([self.orders['CA'], self.orders['Texas']])
+        )
+        self.assertEqual(
+            self.order_ids(self.export(start='2026-01-20', end='2026-02-01')),
+            sorted([self.orders['Texas'], self.orders['uk']]),
+        )
+
+    def test_gzip_stream_decompresses_to_the_plain_export(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('cart.export'), {'format': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('orders.ndjson.gz', response['Content-Disposition'])
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body, self.export(format='ndjson'))
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['country'] for row in rows], ['United States', 'United States', 'United Kingdom'])
+
+    def test_rejects_bad_parameters_and_non_staff(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse('cart.export'), {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('cart.export'), {'start': 'January'}).status_code, 400)
+        self.client.force_login(User.objects.create_user('customer', password='secret'))
+        self.assertEqual(self.client.get(reverse('cart.export')).status_code, 302)
@@ -0,0 +1,117 @@
+"""Time-windowed and time-decayed trending counters.
+
+Sales are kept in hourly SalesBucket rows and added to a TrendingScore per
+(region, movie, window) at checkout, so reading a window's top movies is a
+single indexed query. Windows are "rolled forward" by subtracting the buckets
+that have just fallen out of them; each bucket is subtracted exactly once.
+
+The "hot" window is an exponentially decayed score with a configurable half
+life. It is stored with forward decay: every sale adds
+quantity * 2 ** ((hour - epoch) / half_life), which ranks movies the same way
+as the decayed score at any later time, so nothing needs rewriting as time
+passes. The epoch is moved forward (rescaling every score) long before the
+numbers could overflow.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+WINDOWS = {
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+    '30d': timedelta(days=30),
+}
+HOT = 'hot'
+WINDOW_CHOICES = [
+    ('24h', 'Last 24 hours'),
+    ('7d', 'Last 7 days'),
+    ('30d', 'Last 30 days'),
+    (HOT, 'Hot right now'),
+]
+# Rebase the forward-decay epoch once scores have grown by 2**REBASE_HALF_LIVES
+REBASE_HALF_LIVES = 20
+ROLLED_KEY = 'trending:rolled_hour'
+
+
+def half_life():
+    return timedelta(hours=getattr(settings, 'TRENDING_HALF_LIFE_HOURS', 72))
+
+
+def floor_hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def growth(hour, epoch):
+    """Forward-decay weight of a sale in `hour` relative to `epoch`."""
+    return 2 ** ((hour - epoch) / half_life())
+
+
+def regions_for(state, country):
+    """The (scope, region) keys an order placed in state/country counts towards."""
+    regions = [('overall', '')]
+    if state:
+        regions.append(('state', state))
+    if country:
+        regions.append(('country', country))
+    return regions
+
+
+def rebuild_trending(SalesBucket, TrendingScore, TrendingClock, Item, Region, now=None):
+    """Recompute buckets, scores and clocks from Item/Order history.
+
+    Takes the model classes because cart.models imports this module. Sales are
+    grouped on the orders' integer region keys.
+    """
+    now_hour = floor_hour(now or timezone.now())
+    cutoffs = {window: now_hour - length for window, length in WINDOWS.items()}
+    oldest = min(cutoffs.values())
+
+    SalesBucket.objects.all().delete()
+    TrendingScore.objects.all().delete()
+    TrendingClock.objects.all().delete()
+
+    names = dict(Region.objects.values_list('id', 'name'))
+    buckets = {}
+    scores = {}
+    rows = (
+        Item.objects.annotate(hour=TruncHour('order__date'))
+        .values('order__state_region', 'order__country_region', 'movie_id', 'hour')
+        .annotate(quantity=Sum('quantity'))
+        .order_by()
+    )
+    for row in rows.iterator(chunk_size=2000):
+        hour, quantity = row['hour'], row['quantity']
+        state, country = names.get(row['order__state_region']), names.get(row['order__country_region'])
+        for scope, region in regions_for(state, country):
+            key = (scope, region, row['movie_id'])
+            if hour >= oldest:
+                bucket_key = key + (hour,)
+                buckets[bucket_key] = buckets.get(bucket_key, 0) + quantity
+            for window, cutoff in cutoffs.items():
+                if hour >= cutoff:
+                    scores[key + (window,)] = scores.get(key + (window,), 0) + quantity
+            hot_key = key + (HOT,)
+            scores[hot_key] = scores.get(hot_key, 0) + quantity * growth(hour, now_hour)
+
+    SalesBucket.objects.bulk_create(
+        [
+            SalesBucket(scope=scope, region=region, movie_id=movie_id, hour=hour, quantity=quantity)
+            for (scope, region, movie_id, hour), quantity in buckets.items()
+        ],
+        batch_size=1000,
+    )
+    TrendingScore.objects.bulk_create(
+        [
+            TrendingScore(scope=scope, region=region, movie_id=movie_id, window=window, score=score)
+            for (scope, region, movie_id, window), score in scores.items()
+        ],
+        batch_size=1000,
+    )
+    TrendingClock.objects.bulk_create(
+        [TrendingClock(window=window, cutoff=cutoff) for window, cutoff in cutoffs.items()]
+        + [TrendingClock(window=HOT, cutoff=now_hour)]
+    )
+    return len(scores)
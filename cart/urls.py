@@ -7,4 +7,5 @@ urlpatterns = [
     path('clear/', views.clear, name='cart.clear'),
     path('checkout/', views.checkout, name='cart.checkout'),
     path('purchase/', views.purchase, name='cart.purchase'),
+    path('export/', views.export, name='cart.export'),
 ]
\ No newline at end of file
@@ -1,6 +1,83 @@
+from django.db import IntegrityError, transaction
+
+from accounts.models import Region
+from cart.models import Item, Order, RegionalSales
+
+
+CART_SESSION_KEY = 'cart'
+
+
+def get_cart(request):
+    """Return a copy of the session cart ({str(movie_id): quantity})."""
+    return dict(request.session.get(CART_SESSION_KEY, {}))
+
+
+def save_cart(request, cart):
+    """Store cart in the session only if it changed, so unchanged carts cost no session write."""
+    if request.session.get(CART_SESSION_KEY, {}) != cart:
+        request.session[CART_SESSION_KEY] = cart
+
+
 def calculate_cart_total(cart, movies_in_cart):
     total = 0
     for movie in movies_in_cart:
         quantity = cart[str(movie.id)]
         total += movie.price * int(quantity)
-    return total
\ No newline at end of file
+    return total
+
+
+def find_order(user, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+
+
+def place_order(user, cart, movies_in_cart, state, country, idempotency_key=None):
+    """Write the profile location, order, items and sales rollup as one atomic unit.
+
+    Returns (order, created). A repeated idempotency_key returns the order it
+    already produced instead of creating a duplicate, including when two
+    submits race and the second one hits the (user, idempotency_key)
+    unique constraint.
+    """
+    idempotency_key = idempotency_key or None
+    try:
+        with transaction.atomic():
+            state_region, country_region = Region.resolve_location(state, country)
+            # Stored under the region's own spelling, so text and key always agree
+            state = state_region.name if state_region else state
+            country = country_region.name if country_region else country
+            profile = getattr(user, 'profile', None)
+            if profile is not None and (
+                profile.state_region_id != getattr(state_region, 'id', None)
+                or profile.country_region_id != getattr(country_region, 'id', None)
+            ):
+                profile.state, profile.state_region = state, state_region
+                profile.country, profile.country_region = country, country_region
+                profile.save(update_fields=['state', 'country', 'state_region', 'country_region'])
+
+            order = Order.objects.create(
+                user=user,
+                total=calculate_cart_total(cart, movies_in_cart),
+                state=state,
+                country=country,
+                state_region=state_region,
+                country_region=country_region,
+                idempotency_key=idempotency_key,
+            )
+            items = Item.objects.bulk_create([
+                Item(
+                    movie=movie,
+                    price=movie.price,
+                    order=order,
+                    quantity=int(cart[str(movie.id)]),
+                )
+                for movie in movies_in_cart
+            ])
+            RegionalSales.record_order(order, items)
+    except IntegrityError:
+        existing = find_order(user, idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+    return order, True
@@ -1,17 +1,22 @@
+import uuid
+
 from django.shortcuts import get_object_or_404, redirect, render
-from django.http import HttpRequest
-from cart.models import Item, Order
+from django.http import HttpRequest, HttpResponseBadRequest, StreamingHttpResponse
 from movies.models import Movie
-from .utils import calculate_cart_total
+from .exports import FORMATS, RENDERERS, encode, export_rows, parse_filters
+from .utils import calculate_cart_total, find_order, get_cart, place_order, save_cart
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from accounts.forms import LocationForm
+from popularitymap.utils import invalidate_popularity_data
+from moviesstore.replicas import read_from_replica
 
 # Create your views here.
 
 def index(request):
     cart_total = 0
     movies_in_cart = []
-    cart = request.session.get('cart', {})
+    cart = get_cart(request)
     movie_ids = list(cart.keys())
     if (movie_ids != []):
         movies_in_cart = Movie.objects.filter(id__in=movie_ids)
@@ -31,18 +36,32 @@ def index(request):
 
 def add(request: HttpRequest, id: int):
     get_object_or_404(Movie, id=id)
-    cart = request.session.get('cart', {})
-    cart[id] = request.POST['quantity']
-    request.session['cart'] = cart
+    if request.method != 'POST':
+        return redirect('cart.index')
+    cart = get_cart(request)
+    cart[str(id)] = request.POST['quantity']
+    save_cart(request, cart)
     return redirect('cart.index')
 
 def clear(request):
-    request.session['cart'] = {}
+    save_cart(request, {})
     return redirect('cart.index')
 
+def _purchase_confirmation(request, order):
+    template_data = {}
+    template_data['title'] = 'Purchase confirmation'
+    template_data['order_id'] = order.id
+    return render(request, 'cart/purchase.html', {'template_data': template_data})
+
 @login_required
 def checkout(request):
-    cart = request.session.get('cart', {})
+    if request.method == 'POST':
+        # A double-submit of an order that already went through
+        order = find_order(request.user, request.POST.get('idempotency_key'))
+        if order is not None:
+            return _purchase_confirmation(request, order)
+
+    cart = get_cart(request)
     movie_ids = list(cart.keys())
 
     if (movie_ids == []):
@@ -67,39 +86,26 @@ def checkout(request):
         template_data['movies_in_cart'] = movies_in_cart
         template_data['cart_total'] = cart_total
         template_data['location_form'] = location_form
+        template_data['idempotency_key'] = uuid.uuid4().hex
 
         return render(request, 'cart/checkout.html', {'template_data': template_data})
     
     elif request.method == 'POST':
         location_form = LocationForm(request.POST)
         if location_form.is_valid():
-            # Save location to user profile
-            if hasattr(request.user, 'profile'):
-                request.user.profile.state = location_form.cleaned_data['state']
-                request.user.profile.country = location_form.cleaned_data['country']
-                request.user.profile.save()
-            
-            # Create order with location information
-            order = Order()
-            order.user = request.user
-            order.total = cart_total
-            order.state = location_form.cleaned_data['state']
-            order.country = location_form.cleaned_data['country']
-            order.save()
-
-            for movie in movies_in_cart:
-                item = Item()
-                item.movie = movie
-                item.price = movie.price
-                item.order = order
-                item.quantity = cart[str(movie.id)]
-                item.save()
-
-            request.session['cart'] = {}
-            template_data = {}
-            template_data['title'] = 'Purchase confirmation'
-            template_data['order_id'] = order.id
-            return render(request, 'cart/purchase.html', {'template_data': template_data})
+            order, created = place_order(
+                request.user,
+                cart,
+                movies_in_cart,
+                location_form.cleaned_data['state'],
+                location_form.cleaned_data['country'],
+                request.POST.get('idempotency_key'),
+            )
+            if created:
+                invalidate_popularity_data(order)
+
+            save_cart(request, {})
+            return _purchase_confirmation(request, order)
         
         else:
             template_data = {}
@@ -107,9 +113,36 @@ def checkout(request):
             template_data['movies_in_cart'] = movies_in_cart
             template_data['cart_total'] = cart_total
             template_data['location_form'] = location_form
+            template_data['idempotency_key'] = request.POST.get('idempotency_key') or uuid.uuid4().hex
             return render(request, 'cart/checkout.html', {'template_data': template_data})
 
 @login_required
 def purchase(request):
     # Redirect to checkout for proper location handling
-    return redirect('cart.checkout')
\ No newline at end of file
+    return redirect('cart.checkout')
+
+
+@read_from_replica
+@staff_member_required
+def export(request):
+    """Stream order lines as CSV or NDJSON, filtered by ?state=&country=&start=&end=."""
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in FORMATS:
+        return HttpResponseBadRequest(f"format must be one of: {', '.join(FORMATS)}")
+    try:
+        filters = parse_filters(request.GET)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+
+    rows = export_rows(**filters)
+    # Resolve the database now: the rows are read after the view returns,
+    # outside the request's replica routing
+    rows = rows.using(rows.db)
+    compress = request.GET.get('gzip') == '1'
+    filename = f'orders.{export_format}' + ('.gz' if compress else '')
+    response = StreamingHttpResponse(
+        encode(RENDERERS[export_format](rows), compress),
+        content_type='application/gzip' if compress else FORMATS[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -16,8 +16,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'moviesstore.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from accounts.models import UserProfile
-from cart.models import Order, Item
+from accounts import regions
+from accounts.models import Region, UserProfile
+from cart.models import Order, Item, RegionalSales
 from movies.models import Movie
 from popularitymap.views import index as popularity_view
 from django.test import RequestFactory
@@ -46,7 +47,9 @@ def create_demo_data():
                 user=user,
                 defaults={
                     'state': user_data['state'],
-                    'country': user_data['country']
+                    'country': user_data['country'],
+                    'state_region': Region.resolve(regions.STATE, user_data['state']),
+                    'country_region': Region.resolve(regions.COUNTRY, user_data['country'])
                 }
             )
             print(f"Created user: {user.username} from {profile.state}")
@@ -70,21 +73,26 @@ def create_demo_data():
         # Calculate total
         total = sum(movie.price * qty for movie, qty in zip(order_data['movies'], order_data['quantities']))
         
+        state_region, country_region = Region.resolve_location(order_data['state'], 'United States')
         order = Order.objects.create(
             user=order_data['user'],
             total=total,
             state=order_data['state'],
-            country='United States'
+            country='United States',
+            state_region=state_region,
+            country_region=country_region
         )
         
         # Create items for this order
+        items = []
         for movie, quantity in zip(order_data['movies'], order_data['quantities']):
-            Item.objects.create(
+            items.append(Item.objects.create(
                 order=order,
                 movie=movie,
                 price=movie.price,
                 quantity=quantity
-            )
+            ))
+        RegionalSales.record_order(order, items)
         
         print(f"Created order for {order.user.username} in {order.state} with {len(order_data['movies'])} items")
     
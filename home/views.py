@@ -1,9 +1,11 @@
 from django.http import HttpRequest
 from django.shortcuts import render
+from movies.recommendations import recommend_for
 
 def index(request):
     template_data = {}
     template_data['title'] = 'Movies Store'
+    template_data['recommended'] = recommend_for(request.user)
     return render(request, 'home/index.html', {'template_data': template_data})
     
 def about(request: HttpRequest):
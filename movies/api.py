@@ -0,0 +1,170 @@
+"""Read-only JSON catalog API.
+
+    GET /movies/api/           movies, keyset-paginated (?cursor=, ?limit=)
+    GET /movies/api/<id>/      one movie with its latest reviews (?reviews=)
+
+?fields=id,name,rating picks the fields to return (and the columns to read).
+Responses carry an ETag and Last-Modified built from Movie.updated_at, so
+clients revalidating with If-None-Match/If-Modified-Since get a 304 after a
+single aggregate query, before any movie rows are loaded.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+
+from moviesstore.pagination import paginate
+from moviesstore.replicas import read_from_replica
+
+from .models import RATING_VALUES, Movie, Review
+
+# field: Movie columns it needs
+FIELDS = {
+    'id': ['id'],
+    'name': ['name'],
+    'price': ['price'],
+    'description': ['description'],
+    'image': ['image'],
+    'url': ['id'],
+    'rating': ['rating_count', 'rating_sum'] + [f'rating_{value}' for value in RATING_VALUES],
+    'updated_at': ['updated_at'],
+}
+LIST_FIELDS = ['id', 'name', 'price', 'image', 'url', 'rating', 'updated_at']
+DETAIL_FIELDS = LIST_FIELDS + ['description', 'reviews']
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+REVIEWS_PAGE_SIZE = 10
+
+
+def _error(message):
+    return JsonResponse({'error': message}, status=400)
+
+
+def _requested_fields(request, allowed):
+    if not request.GET.get('fields'):
+        return allowed
+    fields = [field.strip() for field in request.GET['fields'].split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return fields
+
+
+def _columns(fields):
+    columns = {'id'}
+    for field in fields:
+        columns.update(FIELDS.get(field, []))
+    return sorted(columns)
+
+
+def _serialize(request, movie, fields):
+    data = {}
+    for field in fields:
+        if field == 'image':
+            data['image'] = request.build_absolute_uri(movie.image.url) if movie.image else None
+        elif field == 'url':
+            data['url'] = request.build_absolute_uri(reverse('movies.api_detail', args=[movie.id]))
+        elif field == 'rating':
+            data['rating'] = {
+                'average': round(movie.rate_movie(), 2),
+                'count': movie.rating_count,
+                'distribution': {str(value): getattr(movie, f'rating_{value}') for value in RATING_VALUES},
+            }
+        elif field != 'reviews':
+            data[field] = getattr(movie, field)
+    return data
+
+
+def _absolute(request, query):
+    return request.build_absolute_uri(request.path + query) if query else None
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _catalog_marker(request):
+    # Count catches deletions, which don't move the newest updated_at
+    if not hasattr(request, '_catalog_marker'):
+        request._catalog_marker = Movie.objects.aggregate(latest=Max('updated_at'), total=Count('id'))
+    return request._catalog_marker
+
+
+def _list_etag(request):
+    marker = _catalog_marker(request)
+    return _etag(marker['latest'], marker['total'], sorted(request.GET.lists()))
+
+
+def _list_last_modified(request):
+    return _catalog_marker(request)['latest']
+
+
+def _movie_updated_at(request, id):
+    if not hasattr(request, '_movie_updated_at'):
+        request._movie_updated_at = Movie.objects.filter(pk=id).values_list('updated_at', flat=True).first()
+    return request._movie_updated_at
+
+
+def _detail_etag(request, id):
+    updated_at = _movie_updated_at(request, id)
+    if updated_at is None:
+        return None
+    return _etag(id, updated_at, sorted(request.GET.lists()))
+
+
+def _detail_last_modified(request, id):
+    return _movie_updated_at(request, id)
+
+
+@read_from_replica
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_list_etag, last_modified_func=_list_last_modified)
+def movie_list(request):
+    try:
+        fields = _requested_fields(request, LIST_FIELDS)
+        limit = int(request.GET.get('limit', PAGE_SIZE))
+    except ValueError as error:
+        return _error(str(error))
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    page = paginate(Movie.objects.only(*_columns(fields)).order_by('id'), request, page_size=limit)
+    return JsonResponse({
+        'results': [_serialize(request, movie, fields) for movie in page.items],
+        'next': _absolute(request, page.next_url),
+        'previous': _absolute(request, page.prev_url),
+    })
+
+
+@read_from_replica
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_detail_etag, last_modified_func=_detail_last_modified)
+def movie_detail(request, id):
+    try:
+        fields = _requested_fields(request, DETAIL_FIELDS)
+    except ValueError as error:
+        return _error(str(error))
+
+    movie = get_object_or_404(Movie.objects.only(*_columns(fields)), pk=id)
+    data = _serialize(request, movie, fields)
+    if 'reviews' in fields:
+        reviews = paginate(
+            Review.objects.filter(movie_id=movie.id).select_related('user').order_by('-date', '-id'),
+            request,
+            page_size=REVIEWS_PAGE_SIZE,
+            param='reviews',
+        )
+        data['reviews'] = {
+            'results': [
+                {'id': review.id, 'user': review.user.username, 'comment': review.comment, 'date': review.date}
+                for review in reviews.items
+            ],
+            'next': _absolute(request, reviews.next_url),
+            'previous': _absolute(request, reviews.prev_url),
+        }
+    return JsonResponse(data)
@@ -0,0 +1,132 @@
+"""Versioned cache keys for the catalog grid, movie cards and detail pages.
+
+Instead of deleting every cached page when a movie changes, the version
+number embedded in the keys is bumped; old entries simply stop being read
+and age out. The versions are CacheVersion rows in the default database,
+not cache entries: a cache write can be dropped (the database cache ignores
+a locked table), a lost bump would serve stale pages, and a bump made in
+the writer's transaction only shows once the change itself is committed.
+"""
+import hashlib
+import time
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import F
+
+from moviesstore.cache_router import CACHE_DATABASE
+from moviesstore.replicas import primary
+
+CATALOG_VERSION_KEY = 'movies:catalog_version'
+# Only for grids sorted or filtered by rating, which ratings reorder
+RATINGS_VERSION_KEY = 'movies:ratings_version'
+CARD_VERSION_KEY = 'movies:card_version:{}'
+GRID_KEY = 'movies:grid:{}:{}'
+DETAIL_VERSION_KEY = 'movies:detail_version:{}'
+DETAIL_KEY = 'movies:detail:{}:{}:{}'
+# The query params each cached page depends on
+GRID_PARAMS = ('search', 'sort', 'min_rating', 'cursor')
+DETAIL_PARAMS = ('reviews',)
+GRID_TIMEOUT = 60 * 10
+CARD_TIMEOUT = 60 * 60
+# Also bounds how stale "Customers also bought" gets, as it doesn't bump the version
+DETAIL_TIMEOUT = 60 * 10
+
+
+def _model():
+    # movies.models imports this module, so the model is looked up on use
+    return apps.get_model('movies', 'CacheVersion')
+
+
+def _new_version():
+    # Rows start at a time-based number rather than 1, so versions recreated
+    # after the table is emptied (`flush`, a restored backup) never repeat
+    # ones that entries still in the cache were stored under
+    return time.time_ns()
+
+
+def _read(keys):
+    """Return {key: version}; a key that was never bumped reads as 0."""
+    # From the primary even in a replica-routed view, so a bump is seen at once
+    with primary():
+        found = dict(_model().objects.filter(key__in=keys).values_list('key', 'version'))
+    return {key: found.get(key, 0) for key in keys}
+
+
+def _bump(*keys):
+    # Create missing rows first, then increment every one: two concurrent
+    # bumps of a new key still move it twice
+    CacheVersion = _model()
+    CacheVersion.objects.bulk_create(
+        [CacheVersion(key=key, version=_new_version()) for key in keys], ignore_conflicts=True
+    )
+    CacheVersion.objects.filter(key__in=keys).update(version=F('version') + 1)
+
+
+def catalog_version():
+    return _read([CATALOG_VERSION_KEY])[CATALOG_VERSION_KEY]
+
+
+def bump_catalog_version():
+    _bump(CATALOG_VERSION_KEY)
+
+
+def bump_card_version(movie_id):
+    _bump(CARD_VERSION_KEY.format(movie_id))
+
+
+def bump_movie_versions(movie_id):
+    """Bump a movie's card and detail versions and the catalog's, in one go."""
+    _bump(CARD_VERSION_KEY.format(movie_id), DETAIL_VERSION_KEY.format(movie_id), CATALOG_VERSION_KEY)
+
+
+def bump_rating_versions(*movie_ids):
+    """Bump what ratings of these movies show up in: their cards and pages and the rating grids."""
+    keys = [RATINGS_VERSION_KEY]
+    for movie_id in movie_ids:
+        keys += [CARD_VERSION_KEY.format(movie_id), DETAIL_VERSION_KEY.format(movie_id)]
+    _bump(*keys)
+
+
+def card_versions(movie_ids):
+    """Return {movie_id: version} with a single query."""
+    keys = {CARD_VERSION_KEY.format(movie_id): movie_id for movie_id in movie_ids}
+    return {keys[key]: version for key, version in _read(list(keys)).items()}
+
+
+def _digest(params, names):
+    # Only the params the page reads, so junk in the query string (tracking
+    # tags, cache busters) can't fill the cache with copies of one page
+    return hashlib.md5(repr([params.get(name, '') for name in names]).encode()).hexdigest()
+
+
+def grid_key(params):
+    """Cache key for one rendered grid page, from its query params."""
+    keys = [CATALOG_VERSION_KEY]
+    # Every catalog sort is by rating; unsorted grids outlive new ratings
+    if params.get('sort') or params.get('min_rating'):
+        keys.append(RATINGS_VERSION_KEY)
+    versions = _read(keys)
+    version = '.'.join(str(versions[key]) for key in keys)
+    return GRID_KEY.format(version, _digest(params, GRID_PARAMS))
+
+
+def bump_detail_version(movie_id):
+    _bump(DETAIL_VERSION_KEY.format(movie_id))
+
+
+def detail_key(movie_id, params):
+    """Cache key for a movie page's shared fragments, from its query params."""
+    version_key = DETAIL_VERSION_KEY.format(movie_id)
+    return DETAIL_KEY.format(movie_id, _read([version_key])[version_key], _digest(params, DETAIL_PARAMS))
+
+
+def create_cache_table(using, **kwargs):
+    """post_migrate: create the cache table along with the default database's."""
+    # `migrate` never runs against the cache database, which only holds it.
+    # Test databases are left to the test runner, which creates the table once
+    # the test cache database exists
+    database = connections[using].settings_dict
+    if using == DEFAULT_DB_ALIAS and database['NAME'] != database['TEST']['NAME']:
+        call_command('createcachetable', database=CACHE_DATABASE, verbosity=0)
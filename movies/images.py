@@ -0,0 +1,119 @@
+"""Resized WebP/JPEG derivatives of Movie.image for responsive <picture> markup.
+
+Derivatives live next to the uploads under ``movie_images/derived/`` and are
+named after the source file plus a short hash of its full path, so a new
+upload (which Django always stores under a new name) gets fresh derivatives
+and ``poster.jpg`` and ``poster.png`` never share any. They are built when a movie is saved, or
+by `manage.py generate_thumbnails` for images that arrived some other way, and
+rebuilt when the source file is newer than its derivatives. Rendering never
+builds them; until they exist the original image is shown.
+"""
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = 'movie_images/derived'
+WIDTHS = (240, 480, 960)
+# (extension, MIME type, Pillow save options)
+FORMATS = (
+    ('webp', 'image/webp', {'format': 'WEBP', 'quality': 80, 'method': 4}),
+    ('jpg', 'image/jpeg', {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True}),
+)
+# Sources Pillow could not read are not retried until this expires (or --force)
+UNREADABLE_KEY = 'movies:unreadable_image:{}'
+UNREADABLE_TIMEOUT = 60 * 60 * 24
+
+
+def derivative_name(source_name, width, extension):
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    # The stem alone would collide across source extensions and directories
+    digest = hashlib.md5(source_name.encode()).hexdigest()[:8]
+    return f'{DERIVED_DIR}/{stem}-{digest}-{width}w.{extension}'
+
+
+def _unreadable_key(source_name):
+    return UNREADABLE_KEY.format(hashlib.md5(source_name.encode()).hexdigest())
+
+
+def _is_stale(name, source_name, storage):
+    if not storage.exists(name):
+        return True
+    try:
+        return storage.get_modified_time(name) < storage.get_modified_time(source_name)
+    except (NotImplementedError, OSError):
+        return False
+
+
+def generate_derivatives(source_name, storage=default_storage, force=False):
+    """Write every width/format derivative for source_name; returns how many were written."""
+    if not source_name or not storage.exists(source_name):
+        return 0
+    pending = [
+        (width, extension, options)
+        for width in WIDTHS
+        for extension, _, options in FORMATS
+        if force or _is_stale(derivative_name(source_name, width, extension), source_name, storage)
+    ]
+    if not pending or (not force and cache.get(_unreadable_key(source_name))):
+        return 0
+    try:
+        with storage.open(source_name, 'rb') as source:
+            original = ImageOps.exif_transpose(Image.open(source))
+            original.load()
+    except (UnidentifiedImageError, OSError):
+        logger.warning('Could not read movie image %s', source_name)
+        cache.set(_unreadable_key(source_name), True, UNREADABLE_TIMEOUT)
+        return 0
+    if original.mode not in ('RGB', 'L'):
+        original = original.convert('RGB')
+
+    written = 0
+    for width, extension, options in pending:
+        # Never upscale; narrow sources just get a copy at their own width
+        target_width = min(width, original.width)
+        height = round(original.height * target_width / original.width)
+        resized = original.resize((target_width, height), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, **options)
+        name = derivative_name(source_name, width, extension)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(buffer.getvalue()))
+        written += 1
+    return written
+
+
+def delete_derivatives(source_name, storage=default_storage):
+    for width in WIDTHS:
+        for extension, _, _ in FORMATS:
+            name = derivative_name(source_name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def picture_sources(source_name, storage=default_storage):
+    """Return [{'type': mime, 'srcset': '... 240w, ...'}] per format, fallback JPEG last.
+
+    Returns [] while the derivatives haven't been built (or the source can't
+    be processed), so callers can fall back to the original.
+    """
+    if not source_name:
+        return []
+    if not storage.exists(derivative_name(source_name, WIDTHS[-1], FORMATS[-1][0])):
+        return []
+    sources = []
+    for extension, mime_type, _ in FORMATS:
+        srcset = ', '.join(
+            f'{storage.url(derivative_name(source_name, width, extension))} {width}w'
+            for width in WIDTHS
+        )
+        sources.append({'type': mime_type, 'srcset': srcset})
+    return sources
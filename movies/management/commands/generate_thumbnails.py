@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from movies.caching import bump_movie_versions
+from movies.images import generate_derivatives
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Build (or rebuild stale) resized WebP/JPEG derivatives of every Movie.image'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild even if derivatives are fresh')
+
+    def handle(self, *args, **options):
+        written = 0
+        names = list(Movie.objects.exclude(image='').values_list('image', flat=True).distinct())
+        for name in names:
+            count = generate_derivatives(name, force=options['force'])
+            if count:
+                written += count
+                # Cached cards and pages still show the original image
+                for movie_id in Movie.objects.filter(image=name).values_list('id', flat=True):
+                    bump_movie_versions(movie_id)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} derivative(s)'))
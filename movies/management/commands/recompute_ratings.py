@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import Movie
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized rating count/sum/histogram on Movie from Rating'
+
+    def add_arguments(self, parser):
+        parser.add_argument('movie_ids', nargs='*', type=int, help='Only repair these movies')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        movie_ids = options['movie_ids'] or None
+        updated = Movie.recompute_ratings(movie_ids, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Recomputed ratings for {updated} movie(s)'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from movies import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Train the rating-based "Recommended for you" model (item-item similarities)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only retrain movies rated since the last run')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['incremental']:
+            movies, rows = recommendations.train_incremental()
+            if movies is None:
+                summary = f'No previous model; trained {rows} neighbour(s)'
+            else:
+                summary = f'Retrained {movies} movie(s), {rows} neighbour(s)'
+        else:
+            rows = recommendations.train()
+            summary = f'Trained {rows} neighbour(s)'
+        self.stdout.write(self.style.SUCCESS(f'{summary} in {time.perf_counter() - start:.1f}s'))
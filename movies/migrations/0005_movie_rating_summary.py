@@ -0,0 +1,64 @@
+# Generated by Django 5.0 on 2026-10-18 12:51
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_summary(apps, schema_editor):
+    Movie = apps.get_model('movies', 'Movie')
+    Rating = apps.get_model('movies', 'Rating')
+    aggregates = {'count': Count('id'), 'total': Sum('value')}
+    for value in range(1, 6):
+        aggregates[f'v{value}'] = Count('id', filter=Q(value=value))
+    for row in Rating.objects.values('movie_id').annotate(**aggregates).order_by():
+        Movie.objects.filter(pk=row['movie_id']).update(
+            rating_count=row['count'],
+            rating_sum=row['total'],
+            **{f'rating_{value}': row[f'v{value}'] for value in range(1, 6)},
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+# External-content FTS5 index over Movie.name/description. Triggers keep it in
+# step with every INSERT/UPDATE/DELETE on movies_movie, including bulk ORM
+# writes that bypass Model.save().
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS movies_movie_fts USING fts5(
+        name, description,
+        content='movies_movie', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_movie_fts_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_movie_fts_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS movies_movie_fts_au AFTER UPDATE OF name, description ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO movies_movie_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO movies_movie_fts(movies_movie_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS movies_movie_fts_au",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ad",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ai",
+    "DROP TABLE IF EXISTS movies_movie_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_movie_rating_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.0 on 2026-10-18 13:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_query_plan_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'movie similarities',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['updated_at'], name='movies_rating_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='moviesimilarity',
+            name='movie',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar', to='movies.movie'),
+        ),
+        migrations.AddField(
+            model_name='moviesimilarity',
+            name='other',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie'),
+        ),
+        migrations.AddIndex(
+            model_name='moviesimilarity',
+            index=models.Index(fields=['movie', '-score'], name='movies_similarity_top_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='moviesimilarity',
+            unique_together={('movie', 'other')},
+        ),
+    ]
@@ -0,0 +1,26 @@
+import importlib
+
+import django.utils.timezone
+from django.db import migrations, models
+
+# Adding a NOT NULL column makes SQLite rebuild movies_movie, which drops the
+# FTS triggers from 0006; recreate them afterwards (and after reversing).
+fts = importlib.import_module('movies.migrations.0006_movie_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_movie_similarity'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, fts.create_fts),
+        migrations.AddField(
+            model_name='movie',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fts.create_fts, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,32 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.conf import settings
-from django.db.models import Avg
+from django.db.models import Case, Count, Exists, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import bump_detail_version, bump_movie_versions, bump_rating_versions
+from .images import delete_derivatives, generate_derivatives
+
+RATING_VALUES = range(1, 6)
+
+
+class MovieQuerySet(models.QuerySet):
+    def with_average_rating(self):
+        """Annotate avg_rating from the denormalized counters (0.0 when unrated)."""
+        return self.annotate(
+            avg_rating=models.Case(
+                models.When(rating_count=0, then=models.Value(0.0)),
+                default=models.ExpressionWrapper(
+                    F('rating_sum') * 1.0 / F('rating_count'),
+                    output_field=models.FloatField(),
+                ),
+                output_field=models.FloatField(),
+            )
+        )
+
 
 # Create your models here.
 class Movie(models.Model):
@@ -10,13 +35,67 @@ class Movie(models.Model):
     price = models.IntegerField()
     description = models.TextField()
     image = models.ImageField(upload_to='movie_images/')
+    # Denormalized rating summary, kept in step with Rating by Rating.upsert()
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # Last change to anything the JSON API shows for this movie, reviews and
+    # rating counters included; drives the API's ETag/Last-Modified
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = MovieQuerySet.as_manager()
 
     def __str__(self):
         return str(self.id) + ' - ' + self.name
     
     def rate_movie(self):
-        avg_rating = self.ratings.aggregate(avg_value=Avg('value'))['avg_value']
-        return avg_rating if avg_rating is not None else 0.0
+        if not self.rating_count:
+            return 0.0
+        return self.rating_sum / self.rating_count
+
+    def rating_distribution(self):
+        """Return [(stars, count, percent), ...] from 5 stars down to 1."""
+        distribution = []
+        for value in reversed(RATING_VALUES):
+            count = getattr(self, f'rating_{value}')
+            percent = round(100 * count / self.rating_count) if self.rating_count else 0
+            distribution.append((value, count, percent))
+        return distribution
+
+    @classmethod
+    def recompute_ratings(cls, movie_ids=None, batch_size=500):
+        """Rebuild the rating counters from Rating; returns the number of movies updated."""
+        aggregates = {
+            'count': Count('id'),
+            'total': Sum('value'),
+        }
+        for value in RATING_VALUES:
+            aggregates[f'v{value}'] = Count('id', filter=Q(value=value))
+        rows = Rating.objects.values('movie_id').annotate(**aggregates)
+        movies = cls.objects.only('id')
+        if movie_ids is not None:
+            rows = rows.filter(movie_id__in=movie_ids)
+            movies = movies.filter(id__in=movie_ids)
+        summary = {row['movie_id']: row for row in rows.order_by()}
+        fields = ['rating_count', 'rating_sum', 'updated_at'] + [f'rating_{v}' for v in RATING_VALUES]
+        now = timezone.now()
+        updated = []
+        for movie in movies.iterator(chunk_size=batch_size):
+            movie.updated_at = now
+            row = summary.get(movie.id, {})
+            movie.rating_count = row.get('count', 0)
+            movie.rating_sum = row.get('total') or 0
+            for value in RATING_VALUES:
+                setattr(movie, f'rating_{value}', row.get(f'v{value}', 0))
+            updated.append(movie)
+        cls.objects.bulk_update(updated, fields, batch_size=batch_size)
+        for start in range(0, len(updated), batch_size):
+            bump_rating_versions(*[movie.id for movie in updated[start:start + batch_size]])
+        return len(updated)
     
 class Review(models.Model):
     id = models.AutoField(primary_key=True)
@@ -25,6 +104,11 @@ class Review(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['movie', '-date', '-id'], name='movies_review_movie_date_idx'),
+        ]
+
     def __str__(self):
         return str(self.id) + ' - ' + self.movie.name
 
@@ -37,6 +121,116 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ("user", "movie")  # one rating per user per movie
+        indexes = [
+            # train_recommender --incremental looks up ratings changed since the last run
+            models.Index(fields=["updated_at"], name="movies_rating_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user_id}:{self.movie_id} -> {self.value}"
+
+    @classmethod
+    def upsert(cls, user_id, movie_id, value):
+        """Set a user's rating and the movie's counters in two writes; False if the movie doesn't exist.
+
+        The counter UPDATE reads the previous rating in the same statement, so
+        it takes the write lock before anything is read and concurrent raters
+        can't apply a stale delta. The rating itself is a single
+        INSERT ... ON CONFLICT DO UPDATE, which can't race on unique_together.
+        """
+        existing = cls.objects.filter(user_id=user_id, movie_id=OuterRef("pk"))
+        changes = {
+            "rating_sum": F("rating_sum") + value - Coalesce(Subquery(existing.values("value")[:1]), 0),
+            "rating_count": F("rating_count") + Case(When(Exists(existing), then=0), default=1),
+            "updated_at": timezone.now(),
+        }
+        for stars in RATING_VALUES:
+            changes[f"rating_{stars}"] = (
+                F(f"rating_{stars}")
+                + int(stars == value)
+                - Case(When(Exists(existing.filter(value=stars)), then=1), default=0)
+            )
+        with transaction.atomic():
+            if not Movie.objects.filter(pk=movie_id).update(**changes):
+                return False
+            cls.objects.bulk_create(
+                [cls(user_id=user_id, movie_id=movie_id, value=value)],
+                update_conflicts=True,
+                unique_fields=["user", "movie"],
+                update_fields=["value", "updated_at"],
+            )
+            # Only the rating-sorted/filtered grids depend on the counters, so
+            # the rest of the catalog stays cached
+            bump_rating_versions(movie_id)
+        return True
+
+
+class CacheVersion(models.Model):
+    """A version number embedded in cache keys (see movies/caching.py)."""
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.version}"
+
+
+class MovieSimilarity(models.Model):
+    """One of a movie's nearest neighbours by rating (see movies/recommendations.py)."""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="similar")
+    other = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("movie", "other")
+        indexes = [
+            models.Index(fields=["movie", "-score"], name="movies_similarity_top_idx"),
+        ]
+        verbose_name_plural = "movie similarities"
+
+    def __str__(self):
+        return f"{self.movie_id} ~ {self.other_id}: {self.score:.3f}"
+
+
+@receiver(pre_save, sender=Movie)
+def remember_previous_image(sender, instance, **kwargs):
+    instance._previous_image = None
+    if instance.pk:
+        instance._previous_image = (
+            Movie.objects.filter(pk=instance.pk).values_list('image', flat=True).first()
+        )
+
+
+def _delete_unshared_derivatives(movie, name):
+    # Several movies can share one source image (seed data does)
+    if not Movie.objects.filter(image=name).exclude(pk=movie.pk).exists():
+        delete_derivatives(name)
+
+
+@receiver(post_save, sender=Movie)
+def refresh_image_derivatives(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_image', None)
+    if previous and previous != instance.image.name:
+        _delete_unshared_derivatives(instance, previous)
+    if instance.image and (kwargs['created'] or previous != instance.image.name):
+        generate_derivatives(instance.image.name)
+
+
+@receiver(post_delete, sender=Movie)
+def remove_image_derivatives(sender, instance, **kwargs):
+    if instance.image:
+        _delete_unshared_derivatives(instance, instance.image.name)
+
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    bump_movie_versions(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def touch_reviewed_movie(sender, instance, **kwargs):
+    # Reviews are part of the movie's API representation and cached page
+    Movie.objects.filter(pk=instance.movie_id).update(updated_at=timezone.now())
+    bump_detail_version(instance.movie_id)
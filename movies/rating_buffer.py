@@ -0,0 +1,63 @@
+"""Optional write coalescing for ratings (settings.RATING_BUFFER_SECONDS).
+
+Someone clicking through the stars sends several ratings in a row and only
+the last one matters. With buffering on, rate_movie puts the rating in a
+per-process buffer (a later click replaces an earlier one), and a timer
+writes everything buffered RATING_BUFFER_SECONDS later in one transaction:
+a burst of clicks from many users takes SQLite's writer lock once.
+
+Buffered ratings are lost if the process dies before the flush, which is
+why this is off by default.
+"""
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import Rating
+
+
+class RatingBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def add(self, user_id, movie_id, value):
+        with self._lock:
+            self._pending[user_id, movie_id] = value
+            if self._timer is None:
+                self._timer = threading.Timer(settings.RATING_BUFFER_SECONDS, self._flush_in_thread)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self, user_id, movie_id):
+        """The buffered, not yet written rating, or None."""
+        return self._pending.get((user_id, movie_id))
+
+    def flush(self):
+        """Write every buffered rating; returns how many were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        written = 0
+        with transaction.atomic():
+            for (user_id, movie_id), value in pending.items():
+                # A movie deleted meanwhile just drops its rating
+                written += Rating.upsert(user_id, movie_id, value)
+        return written
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            # Timer threads aren't request threads; nothing else closes any
+            # connection the flush (or a signal receiver it runs) opened
+            connections.close_all()
+
+
+rating_buffer = RatingBuffer()
+atexit.register(rating_buffer.flush)
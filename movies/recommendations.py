@@ -0,0 +1,211 @@
+"""Item-item collaborative filtering over Rating ("Recommended for you").
+
+train() compares movies by adjusted cosine similarity over the user x movie
+rating matrix: each rating is centred on its user's mean, so a 3 from a
+generous rater counts as a dislike. The top NEIGHBORS per movie are stored in
+MovieSimilarity. Serving loads those lists once per process into compact
+arrays and scores a user's unrated movies in memory; the only per-request
+queries are the user's own ratings and the recommended Movie rows.
+"""
+import heapq
+import math
+import random
+import threading
+import time
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connections, transaction
+from django.db.models import Avg, Max, Subquery
+
+from .models import Movie, MovieSimilarity, Rating
+
+NEIGHBORS = 20
+# Similarities backed by few co-raters are damped by count / (count + SHRINKAGE)
+MIN_CO_RATERS = 2
+SHRINKAGE = 10
+# Pairs grow with the square of a user's ratings; sample heavy raters down
+MAX_USER_RATINGS = 300
+# How often a process picks up a model trained by another process
+RELOAD_SECONDS = 300
+
+
+def _user_means():
+    rows = Rating.objects.values('user_id').annotate(mean=Avg('value')).order_by()
+    return {row['user_id']: row['mean'] for row in rows.iterator(chunk_size=2000)}
+
+
+def _by_user(ratings):
+    """Yield (user_id, [(movie_id, value), ...]) from ratings ordered by user."""
+    rows = ratings.order_by('user_id').values_list('user_id', 'movie_id', 'value')
+    for user_id, group in groupby(rows.iterator(chunk_size=2000), key=itemgetter(0)):
+        yield user_id, [(movie_id, value) for _, movie_id, value in group]
+
+
+def _norms(means):
+    norms = {}
+    for user_id, ratings in _by_user(Rating.objects.all()):
+        mean = means[user_id]
+        for movie_id, value in ratings:
+            norms[movie_id] = norms.get(movie_id, 0.0) + (value - mean) ** 2
+    return norms
+
+
+def _neighbors(ratings, means, norms, targets=None):
+    """Return {movie_id: [(other_id, score), ...]} best first, for targets (default: all)."""
+    dots = {}
+    counts = {}
+    for user_id, user_ratings in _by_user(ratings):
+        if len(user_ratings) > MAX_USER_RATINGS:
+            user_ratings = random.Random(user_id).sample(user_ratings, MAX_USER_RATINGS)
+        mean = means[user_id]
+        centred = [(movie_id, value - mean) for movie_id, value in user_ratings]
+        for movie_id, deviation in centred:
+            if targets is not None and movie_id not in targets:
+                continue
+            for other_id, other_deviation in centred:
+                if other_id != movie_id:
+                    key = (movie_id, other_id)
+                    dots[key] = dots.get(key, 0.0) + deviation * other_deviation
+                    counts[key] = counts.get(key, 0) + 1
+
+    candidates = {}
+    for (movie_id, other_id), dot in dots.items():
+        count = counts[movie_id, other_id]
+        denominator = math.sqrt(norms.get(movie_id, 0) * norms.get(other_id, 0))
+        if count < MIN_CO_RATERS or dot <= 0 or not denominator:
+            continue
+        score = dot / denominator * count / (count + SHRINKAGE)
+        candidates.setdefault(movie_id, []).append((score, other_id))
+    return {
+        movie_id: [(other_id, score) for score, other_id in heapq.nlargest(NEIGHBORS, scored)]
+        for movie_id, scored in candidates.items()
+    }
+
+
+def _save(neighbors, movie_ids=None):
+    rows = [
+        MovieSimilarity(movie_id=movie_id, other_id=other_id, score=score)
+        for movie_id, others in neighbors.items()
+        for other_id, score in others
+    ]
+    with transaction.atomic():
+        existing = MovieSimilarity.objects.all()
+        if movie_ids is not None:
+            existing = existing.filter(movie_id__in=movie_ids)
+        existing.delete()
+        MovieSimilarity.objects.bulk_create(rows, batch_size=1000)
+    _index.expire()
+    return len(rows)
+
+
+def train():
+    """Recompute every movie's neighbours; returns the number of rows stored."""
+    means = _user_means()
+    return _save(_neighbors(Rating.objects.all(), means, _norms(means)))
+
+
+def train_incremental():
+    """Recompute neighbours only for movies rated since the last training run.
+
+    Returns (movies retrained, rows stored). Other movies keep their lists,
+    including scores against the retrained movies, until the next train().
+    """
+    last_run = MovieSimilarity.objects.aggregate(last_run=Max('computed_at'))['last_run']
+    if last_run is None:
+        return None, train()
+    changed = set(
+        Rating.objects.filter(updated_at__gt=last_run).values_list('movie_id', flat=True).distinct()
+    )
+    if not changed:
+        return 0, 0
+    means = _user_means()
+    raters = Rating.objects.filter(movie_id__in=changed).values('user_id')
+    neighbors = _neighbors(Rating.objects.filter(user_id__in=Subquery(raters)), means, _norms(means), changed)
+    return len(changed), _save(neighbors, changed)
+
+
+class _SimilarityIndex:
+    """Per-process {movie_id: (array of other ids, array of scores)}, reloaded periodically.
+
+    Only the first load makes a request wait. After that a stale index keeps
+    being served while one background thread builds its replacement, which
+    is swapped in with a single assignment.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._neighbors = None
+        self._loaded_at = 0.0
+
+    def expire(self):
+        self._loaded_at = 0.0
+
+    def get(self):
+        neighbors = self._neighbors
+        if neighbors is None:
+            # Nothing to serve yet, so this one load is waited for
+            with self._lock:
+                if self._neighbors is None:
+                    self._swap(self._load())
+            return self._neighbors
+        if time.monotonic() - self._loaded_at > RELOAD_SECONDS and self._lock.acquire(blocking=False):
+            # The lock is held until the reload ends, so only one runs at a time
+            threading.Thread(target=self._reload_in_thread, daemon=True).start()
+        return neighbors
+
+    def _swap(self, neighbors):
+        self._neighbors = neighbors
+        self._loaded_at = time.monotonic()
+
+    def _reload_in_thread(self):
+        try:
+            self._swap(self._load())
+        finally:
+            self._lock.release()
+            # Not a request thread; nothing else closes its connections
+            connections.close_all()
+
+    def _load(self):
+        rows = MovieSimilarity.objects.order_by('movie_id', '-score').values_list('movie_id', 'other_id', 'score')
+        neighbors = {}
+        for movie_id, group in groupby(rows.iterator(chunk_size=5000), key=itemgetter(0)):
+            others, scores = array('i'), array('f')
+            for _, other_id, score in group:
+                others.append(other_id)
+                scores.append(score)
+            neighbors[movie_id] = (others, scores)
+        return neighbors
+
+
+_index = _SimilarityIndex()
+
+
+def recommend_for(user, limit=8):
+    """Movies the user has not rated, best predicted rating first ([] for anonymous users)."""
+    if not user.is_authenticated:
+        return []
+    ratings = list(Rating.objects.filter(user=user).values_list('movie_id', 'value'))
+    if not ratings:
+        return []
+    neighbors = _index.get()
+    mean = sum(value for _, value in ratings) / len(ratings)
+    rated = {movie_id for movie_id, _ in ratings}
+    weighted = {}
+    weights = {}
+    for movie_id, value in ratings:
+        if movie_id not in neighbors:
+            continue
+        deviation = value - mean
+        others, scores = neighbors[movie_id]
+        for other_id, score in zip(others, scores):
+            if other_id not in rated:
+                weighted[other_id] = weighted.get(other_id, 0.0) + score * deviation
+                weights[other_id] = weights.get(other_id, 0.0) + score
+    # The +1 keeps a movie with one weak neighbour from outranking well-supported ones
+    ranked = heapq.nlargest(
+        limit, weights, key=lambda movie_id: (weighted[movie_id] / (weights[movie_id] + 1), weights[movie_id])
+    )
+    movies = Movie.objects.only('id', 'name', 'image').in_bulk(ranked)
+    return [movies[movie_id] for movie_id in ranked if movie_id in movies]
@@ -0,0 +1,60 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Movie
+
+FTS_TABLE = 'movies_movie_fts'
+# bm25 column weights: a hit in the title counts far more than one in the description
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def fts_available(using='default'):
+    """True when the FTS5 index from migration 0006 exists on this database.
+
+    Checked on every search (one lookup in sqlite_master) rather than
+    remembered, so a process started before the migration ran, or pointed at
+    another database file, never queries a table that isn't there.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def build_match_query(search_term):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    tokens = re.findall(r'\w+', search_term)
+    return ' '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+
+
+def search_movies(search_term, queryset=None):
+    """Movies matching search_term in name or description, best matches first.
+
+    Falls back to a case-insensitive substring filter when FTS5 is unavailable.
+    """
+    if queryset is None:
+        queryset = Movie.objects.all()
+    match = build_match_query(search_term)
+    if not match or not fts_available(queryset.db):
+        return queryset.filter(
+            Q(name__icontains=search_term) | Q(description__icontains=search_term)
+        )
+    # Joined on rowid so MATCH runs once and bm25() reads the rank of the row
+    # being matched, instead of re-running MATCH for every candidate movie
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {Movie._meta.db_table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).annotate(
+        search_rank=RawSQL(
+            f'bm25({FTS_TABLE}, %s, %s)',
+            (NAME_WEIGHT, DESCRIPTION_WEIGHT),
+            output_field=FloatField(),
+        )
+    ).order_by('search_rank', 'id')
@@ -0,0 +1,22 @@
+from django import template
+
+from movies.images import picture_sources
+
+register = template.Library()
+
+CARD_SIZES = '(min-width: 992px) 25vw, (min-width: 768px) 33vw, 100vw'
+
+
+@register.inclusion_tag('movies/picture.html')
+def movie_picture(movie, css_class='', style='', sizes=CARD_SIZES, loading='lazy'):
+    """Render movie.image as a <picture> with WebP and JPEG srcsets."""
+    sources = picture_sources(movie.image.name) if movie.image else []
+    return {
+        'movie': movie,
+        'webp': sources[0] if sources else None,
+        'jpeg': sources[-1] if sources else None,
+        'css_class': css_class,
+        'style': style,
+        'sizes': sizes,
+        'loading': loading,
+    }
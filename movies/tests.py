@@ -1,3 +1,386 @@
-from django.test import TestCase
+import base64
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from PIL import Image
+
+from moviesstore.pagination import encode_cursor, paginate
+
+from . import caching, images
+from .models import Movie, Rating, Review
+from .recommendations import _SimilarityIndex
+from .search import FTS_TABLE, fts_available, search_movies
 
 # Create your tests here.
+
+
+class RatingUpsertTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name='Heat', price=10, description='Heist')
+        cls.alice = User.objects.create_user('alice', password='secret')
+        cls.bob = User.objects.create_user('bob', password='secret')
+
+    def counters(self):
+        movie = Movie.objects.get(pk=self.movie.pk)
+        histogram = [getattr(movie, f'rating_{stars}') for stars in range(1, 6)]
+        return movie.rating_count, movie.rating_sum, histogram
+
+    def test_new_ratings_add_to_the_counters(self):
+        self.assertTrue(Rating.upsert(self.alice.id, self.movie.id, 4))
+        self.assertTrue(Rating.upsert(self.bob.id, self.movie.id, 2))
+        self.assertEqual(self.counters(), (2, 6, [0, 1, 0, 1, 0]))
+
+    def test_changed_rating_moves_sum_and_histogram_but_not_count(self):
+        Rating.upsert(self.alice.id, self.movie.id, 4)
+        Rating.upsert(self.bob.id, self.movie.id, 2)
+        Rating.upsert(self.alice.id, self.movie.id, 1)
+        self.assertEqual(self.counters(), (2, 3, [1, 1, 0, 0, 0]))
+        self.assertEqual(Rating.objects.get(user=self.alice, movie=self.movie).value, 1)
+
+    def test_same_rating_again_changes_nothing(self):
+        Rating.upsert(self.alice.id, self.movie.id, 5)
+        Rating.upsert(self.alice.id, self.movie.id, 5)
+        self.assertEqual(self.counters(), (1, 5, [0, 0, 0, 0, 1]))
+        self.assertEqual(Rating.objects.count(), 1)
+
+    def test_unknown_movie_writes_nothing(self):
+        self.assertFalse(Rating.upsert(self.alice.id, self.movie.id + 1, 3))
+        self.assertFalse(Rating.objects.exists())
+
+    @override_settings(RATING_BUFFER_SECONDS=0)
+    def test_rate_view_validates_and_upserts(self):
+        self.client.force_login(self.alice)
+        url = reverse('movies.rate', kwargs={'id': self.movie.id})
+        self.assertEqual(self.client.post(url, {'rating': '9'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'rating': 'x'}).status_code, 400)
+        self.assertRedirects(
+            self.client.post(url, {'rating': '3'}),
+            reverse('movies.show', kwargs={'id': self.movie.id}),
+            fetch_redirect_response=False,
+        )
+        self.client.post(url, {'rating': '5'})
+        self.assertEqual(self.counters(), (1, 5, [0, 0, 0, 0, 1]))
+
+
+class CacheVersionTests(TransactionTestCase):
+    def test_concurrent_bumps_are_never_lost(self):
+        caching.bump_catalog_version()
+        before = caching.catalog_version()
+
+        def bump(worker):
+            try:
+                for _ in range(50):
+                    caching.bump_catalog_version()
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(bump, range(8)))
+        self.assertEqual(caching.catalog_version() - before, 400)
+
+
+class FragmentCacheTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        Movie.objects.bulk_create([
+            Movie(name=f'Movie {number}', price=5, description='Film', image='movie_images/film.jpg')
+            for number in range(15)
+        ])
+
+    def test_grid_is_keyed_on_the_params_it_reads(self):
+        self.assertEqual(
+            caching.grid_key({'search': 'heat', 'utm_source': 'mail'}), caching.grid_key({'search': 'heat'})
+        )
+        self.assertNotEqual(caching.grid_key({'search': 'heat'}), caching.grid_key({'search': 'ran'}))
+        self.assertNotEqual(caching.grid_key({'sort': 'rating'}), caching.grid_key({'min_rating': 'rating'}))
+
+        response = self.client.get(reverse('movies.index'), {'sort': 'most_rated', 'utm_source': 'mail'})
+        self.assertContains(response, '?sort=most_rated&amp;cursor=')
+        self.assertNotContains(response, 'utm_source')
+
+    def test_rating_only_moves_rating_grids_and_that_movie(self):
+        movie = Movie.objects.first()
+        user = User.objects.create_user('rater', password='secret')
+        keys = [caching.grid_key({}), caching.grid_key({'sort': 'rating'}), caching.detail_key(movie.id, {})]
+        cards = caching.card_versions([movie.id, movie.id + 1])
+        Rating.upsert(user.id, movie.id, 4)
+        self.assertEqual(caching.grid_key({}), keys[0])
+        self.assertNotEqual(caching.grid_key({'sort': 'rating'}), keys[1])
+        self.assertNotEqual(caching.detail_key(movie.id, {}), keys[2])
+        after = caching.card_versions([movie.id, movie.id + 1])
+        self.assertNotEqual(after[movie.id], cards[movie.id])
+        self.assertEqual(after[movie.id + 1], cards[movie.id + 1])
+
+    def grid(self, **params):
+        return self.client.get(reverse('movies.index'), params).content.decode()
+
+    def test_movie_edit_replaces_the_cached_grid_and_card(self):
+        movie = Movie.objects.get(name='Movie 0')
+        self.assertIn('Movie 0', self.grid())
+        # A write that bumps nothing is not seen: the grid really is cached
+        Movie.objects.filter(pk=movie.pk).update(name='Renamed quietly')
+        self.assertIn('Movie 0', self.grid())
+        self.assertNotIn('Renamed quietly', self.grid())
+
+        movie.name = 'Heat'
+        movie.save()
+        self.assertIn('Heat', self.grid())
+        self.assertNotIn('Movie 0', self.grid())
+
+    def test_card_fragment_is_reused_until_its_own_version_moves(self):
+        movie = Movie.objects.get(name='Movie 0')
+        self.grid()
+        # New grid version, but the card is still cached under its old one
+        Movie.objects.filter(pk=movie.pk).update(name='Heat')
+        caching.bump_catalog_version()
+        self.assertIn('Movie 0', self.grid())
+        caching.bump_card_version(movie.id)
+        caching.bump_catalog_version()
+        self.assertIn('Heat', self.grid())
+
+    def test_rating_reorders_the_cached_rating_grid(self):
+        user = User.objects.create_user('rater', password='secret')
+        last = Movie.objects.get(name='Movie 14')
+        self.assertNotIn('Movie 14', self.grid(sort='rating'))
+        Rating.upsert(user.id, last.id, 5)
+        self.assertIn('Movie 14', self.grid(sort='rating'))
+
+    def test_movie_page_is_keyed_on_the_reviews_cursor_only(self):
+        movie_id = Movie.objects.first().id
+        self.assertEqual(caching.detail_key(movie_id, {'ref': 'home'}), caching.detail_key(movie_id, {}))
+        self.assertNotEqual(caching.detail_key(movie_id, {'reviews': 'abc'}), caching.detail_key(movie_id, {}))
+
+
+class DetailCacheTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name='Heat', price=10, description='Heist', image='movie_images/film.jpg')
+        cls.user = User.objects.create_user('critic', password='secret')
+
+    def page(self):
+        return self.client.get(reverse('movies.show', kwargs={'id': self.movie.id})).content.decode()
+
+    def test_new_review_replaces_the_cached_page(self):
+        self.assertNotIn('Tense', self.page())
+        self.movie.review_set.create(comment='Tense', user=self.user)
+        self.assertIn('Tense', self.page())
+
+    def test_write_that_bumps_nothing_stays_hidden_until_bumped(self):
+        self.page()
+        # bulk_create sends no post_save, so the detail version stays put
+        Review.objects.bulk_create([Review(comment='Tense', movie=self.movie, user=self.user)])
+        self.assertNotIn('Tense', self.page())
+        caching.bump_detail_version(self.movie.id)
+        self.assertIn('Tense', self.page())
+
+    def test_rating_replaces_the_cached_average(self):
+        self.assertIn('No ratings have been given', self.page())
+        Rating.upsert(self.user.id, self.movie.id, 4)
+        self.assertIn('4.0/5.0', self.page())
+
+
+class ImageDerivativeTests(TestCase):
+    databases = {'default', 'cache'}
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def test_sources_differing_only_in_extension_get_their_own_derivatives(self):
+        self.assertNotEqual(
+            images.derivative_name('movie_images/poster.jpg', 240, 'webp'),
+            images.derivative_name('movie_images/poster.png', 240, 'webp'),
+        )
+        self.assertNotEqual(
+            images.derivative_name('movie_images/a/poster.jpg', 240, 'webp'),
+            images.derivative_name('movie_images/b/poster.jpg', 240, 'webp'),
+        )
+
+    def test_generate_thumbnails_refreshes_cached_cards(self):
+        buffer = BytesIO()
+        Image.new('RGB', (64, 96), 'red').save(buffer, 'PNG')
+        name = default_storage.save('movie_images/poster.png', ContentFile(buffer.getvalue()))
+        # As fixtures and seed_data do: no save signal builds the derivatives
+        Movie.objects.bulk_create([Movie(name='Heat', price=10, description='Heist', image=name)])
+        movie = Movie.objects.get()
+        self.assertEqual(images.picture_sources(name), [])
+        before = caching.card_versions([movie.id])[movie.id]
+
+        call_command('generate_thumbnails', stdout=StringIO())
+
+        self.assertEqual(len(images.picture_sources(name)), len(images.FORMATS))
+        self.assertNotEqual(caching.card_versions([movie.id])[movie.id], before)
+
+
+class SimilarityIndexTests(TransactionTestCase):
+    def test_stale_index_is_served_while_it_reloads(self):
+        index = _SimilarityIndex()
+        first = index.get()
+        index.expire()
+        with index._lock:
+            # A reload is already running: readers get the old index at once
+            self.assertIs(index.get(), first)
+        self.assertIs(index.get(), first)
+        deadline = time.monotonic() + 5
+        while index._neighbors is first and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIsNot(index._neighbors, first)
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Movie.objects.create(name='Heat', price=10, description='A heist in Los Angeles')
+        Movie.objects.create(name='Ran', price=7, description='Heat of battle')
+
+    def names(self, search_term):
+        return [movie.name for movie in search_movies(search_term)]
+
+    def test_full_text_search_ranks_title_hits_first(self):
+        self.assertTrue(fts_available())
+        self.assertEqual(self.names('heat'), ['Heat', 'Ran'])
+        self.assertEqual(self.names('los ang'), ['Heat'])
+
+    def test_falls_back_to_substring_matching_without_the_index(self):
+        self.assertTrue(fts_available())
+        # Rolled back with the test case's transaction
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {FTS_TABLE}')
+        self.assertFalse(fts_available())
+        self.assertEqual(sorted(self.names('heat')), ['Heat', 'Ran'])
+        self.assertEqual(self.names('Los Angeles'), ['Heat'])
+
+
+def raw_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class KeysetPaginationTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        Movie.objects.bulk_create([
+            Movie(name=f'Movie {number}', price=5, description='Film', image='movie_images/film.jpg',
+                  rating_count=1, rating_sum=number % 5 + 1)
+            for number in range(25)
+        ])
+        cls.ids = list(Movie.objects.order_by('id').values_list('id', flat=True))
+
+    def test_walks_forward_and_back_without_gaps(self):
+        queryset = Movie.objects.order_by('id')
+        first = paginate(queryset, page_size=10)
+        second = paginate(queryset, cursor=first.next_cursor, page_size=10)
+        third = paginate(queryset, cursor=second.next_cursor, page_size=10)
+        self.assertEqual([movie.id for movie in first.items + second.items + third.items], self.ids)
+        self.assertFalse(third.has_next)
+        back = paginate(queryset, cursor=third.prev_cursor, page_size=10)
+        self.assertEqual([movie.id for movie in back], [movie.id for movie in second])
+
+    def test_ties_on_a_computed_ordering_break_on_id(self):
+        queryset = Movie.objects.with_average_rating().order_by('-avg_rating')
+        seen = []
+        page = paginate(queryset, page_size=4)
+        while True:
+            seen += [movie.id for movie in page]
+            if not page.has_next:
+                break
+            page = paginate(queryset, cursor=page.next_cursor, page_size=4)
+        self.assertEqual(sorted(seen), self.ids)
+
+    def test_bad_cursors_read_as_missing(self):
+        queryset = Movie.objects.order_by('id')
+        for cursor in [
+            'not base64!', raw_cursor({'v': ['x'], 'd': 'n'}), raw_cursor({'v': [None], 'd': 'n'}),
+            raw_cursor({'v': [1, 2], 'd': 'n'}), raw_cursor({'v': [1], 'd': 'sideways'}),
+            encode_cursor([[1]], 'p'),
+        ]:
+            with self.subTest(cursor=cursor):
+                page = paginate(queryset, cursor=cursor, page_size=10)
+                self.assertEqual([movie.id for movie in page], self.ids[:10])
+                self.assertFalse(page.has_prev)
+
+    def test_views_ignore_bad_cursors(self):
+        user = User.objects.create_user('viewer', password='secret')
+        self.client.force_login(user)
+        bad = raw_cursor({'v': ['x'], 'd': 'n'})
+        for url, params in [
+            (reverse('movies.index'), {'cursor': bad}),
+            (reverse('movies.index'), {'cursor': raw_cursor({'v': ['x', 'y', 'z'], 'd': 'n'}), 'sort': 'rating'}),
+            (reverse('movies.show', kwargs={'id': self.ids[0]}), {'reviews': bad}),
+            (reverse('movies.api_list'), {'cursor': bad}),
+            (reverse('accounts.orders'), {'cursor': bad}),
+        ]:
+            with self.subTest(url=url, params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 200)
+
+
+class CatalogApiTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(name='Heat', price=10, description='Heist', image='movie_images/heat.jpg')
+        Movie.objects.create(name='Ran', price=7, description='Epic', image='movie_images/ran.jpg')
+
+    def test_list_revalidates_with_etag(self):
+        url = reverse('movies.api_list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([movie['name'] for movie in response.json()['results']], ['Heat', 'Ran'])
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        # A different query is a different representation
+        self.assertEqual(self.client.get(url, {'limit': 1}, headers={'If-None-Match': etag}).status_code, 200)
+
+        self.movie.name = 'Heat (1995)'
+        self.movie.save()
+        changed = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+        # Deleting a movie doesn't move the newest updated_at but must change the ETag
+        Movie.objects.filter(name='Ran').delete()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': changed['ETag']}).status_code, 200)
+
+    def test_detail_revalidates_and_changes_with_reviews(self):
+        url = reverse('movies.api_detail', kwargs={'id': self.movie.id})
+        response = self.client.get(url)
+        self.assertEqual(response.json()['reviews']['results'], [])
+        self.assertEqual(
+            self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']}).status_code, 304
+        )
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        user = User.objects.create_user('critic', password='secret')
+        self.movie.review_set.create(user=user, comment='Great')
+        response = self.client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([review['comment'] for review in response.json()['reviews']['results']], ['Great'])
+
+    def test_field_selection(self):
+        url = reverse('movies.api_detail', kwargs={'id': self.movie.id})
+        self.assertEqual(self.client.get(url, {'fields': 'id,name'}).json(), {'id': self.movie.id, 'name': 'Heat'})
+        self.assertEqual(self.client.get(url, {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('movies.api_detail', kwargs={'id': 999})).status_code, 404)
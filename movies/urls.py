@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='movies.index'),
@@ -11,5 +11,10 @@ urlpatterns = [
 
     #  New route for trending movies
     path('trending/', views.trending_movies, name='movies.trending'),
+    path('trending/async/', views.trending_movies_async, name='movies.trending_async'),
+
+    # Read-only JSON catalog API
+    path('api/', api.movie_list, name='movies.api_list'),
+    path('api/<int:id>/', api.movie_detail, name='movies.api_detail'),
     
 ]
@@ -1,27 +1,60 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
-from django.http import HttpResponseBadRequest
+from django.db.models import Count, Q
+from django.conf import settings
+from django.http import Http404, HttpResponseBadRequest
 from .models import Movie, Review, Rating
-from accounts.models import UserProfile
-from cart.models import Item, Order  # ✅ needed for region-based filtering
-from django.db.models import Sum
+from .rating_buffer import rating_buffer
+from .recommendations import recommend_for
+from .search import search_movies
+from .caching import (
+    CARD_TIMEOUT, DETAIL_PARAMS, DETAIL_TIMEOUT, GRID_PARAMS, GRID_TIMEOUT, card_versions, detail_key, grid_key,
+)
+from moviesstore.concurrency import gather_queries
+from moviesstore.pagination import paginate
+from moviesstore.replicas import note_write, primary, read_from_replica
+from accounts import regions
+from accounts.models import Region, UserProfile
+from cart.models import CoPurchase, RegionalSales, TrendingScore  # ✅ precomputed region-based sales
+from cart.trending import WINDOW_CHOICES
 
 
 # ------------------------------
 # Existing Movie & Review Views
 # ------------------------------
 
+MOVIES_PER_PAGE = 12
+REVIEWS_PER_PAGE = 10
+
+TRENDING_WINDOWS = dict(WINDOW_CHOICES)
+
+CATALOG_ORDERINGS = {
+    'rating': ('-avg_rating', '-rating_count', 'id'),
+    'most_rated': ('-rating_count', 'id'),
+}
+
+
+@read_from_replica
 def index(request):
-    search_term = request.GET.get('search')
-    if search_term:
-        movies = Movie.objects.filter(name__icontains=search_term)
-    else:
-        movies = Movie.objects.all()
-    
+    # The rendered grid only depends on GRID_PARAMS, so it is shared by
+    # everyone until a movie changes and bumps the catalog version (or, for
+    # rating sorts and filters, until someone rates)
+    key = grid_key(request.GET.dict())
+    grid_html = cache.get(key)
+    if grid_html is None:
+        with primary():
+            grid_html = render_to_string('movies/grid.html', _catalog_grid(request), request=request)
+        cache.set(key, grid_html, GRID_TIMEOUT)
+
     template_data = {
         'title': 'Movies',
-        'movies': movies,
+        'grid_html': mark_safe(grid_html),
+        'recommended': recommend_for(request.user),
     }
     
     return render(request, 'movies/index.html', {
@@ -29,19 +62,97 @@ def index(request):
     })
 
 
+def _catalog_grid(request):
+    search_term = request.GET.get('search')
+    if search_term:
+        movies = search_movies(search_term)
+    else:
+        movies = Movie.objects.all()
+
+    # Rating filters/sorts read the counters on Movie, no join against Rating
+    movies = movies.with_average_rating()
+    min_rating = request.GET.get('min_rating')
+    if min_rating:
+        try:
+            movies = movies.filter(avg_rating__gte=float(min_rating))
+        except ValueError:
+            pass
+    sort = request.GET.get('sort')
+    if sort in CATALOG_ORDERINGS:
+        movies = movies.order_by(*CATALOG_ORDERINGS[sort])
+    
+    page = paginate(movies, request, page_size=MOVIES_PER_PAGE, keep=GRID_PARAMS)
+    versions = card_versions([movie.id for movie in page.items])
+    for movie in page.items:
+        movie.card_version = versions[movie.id]
+
+    return {
+        'movies': page.items,
+        'page': page,
+        'card_timeout': CARD_TIMEOUT,
+    }
+
+
+def _reviews_context(request, movie_id):
+    reviews = paginate(
+        Review.objects.filter(movie_id=movie_id).select_related('user').order_by('-date', '-id'),
+        request,
+        page_size=REVIEWS_PER_PAGE,
+        param='reviews',
+        keep=DETAIL_PARAMS,
+    )
+    return {'movie_id': movie_id, 'reviews': reviews.items, 'reviews_page': reviews}
+
+
+def _movie_page(id, reviews):
+    movie = get_object_or_404(Movie, id=id)
+    context = {
+        'movie': movie,
+        'avg_rating': movie.rate_movie(),
+        'rating_distribution': movie.rating_distribution(),
+        'also_bought': CoPurchase.also_bought(movie),
+    }
+    # Rendered without the request, so no user and no buttons on their reviews
+    return {
+        'title': movie.name,
+        'movie_id': movie.id,
+        'summary_html': render_to_string('movies/show_summary.html', context),
+        'reviews_html': render_to_string('movies/show_reviews.html', reviews),
+        'sidebar_html': render_to_string('movies/show_sidebar.html', context),
+    }
+
+
+@read_from_replica
 def show(request, id):
-    movie = Movie.objects.get(id=id)
-    reviews = Review.objects.filter(movie=movie)
+    # Everything but the forms, the user's rating and the buttons on their own
+    # reviews is the same for every visitor, so it is rendered once per movie
+    # version (bumped by review and rating writes) and reviews page
+    key = detail_key(id, request.GET.dict())
+    page = cache.get(key)
+    reviews = None
+    if page is None:
+        with primary():
+            reviews = _reviews_context(request, id)
+            page = _movie_page(id, reviews)
+        cache.set(key, page, DETAIL_TIMEOUT)
+
+    reviews_html = page['reviews_html']
     user_rating = None
     if request.user.is_authenticated:
-        user_rating = Rating.objects.filter(user=request.user, movie=movie).first()
+        user_rating = rating_buffer.pending(request.user.id, id)
+        if user_rating is None:
+            user_rating = Rating.objects.filter(user=request.user, movie_id=id).values_list('value', flat=True).first()
+        if Review.objects.filter(movie_id=id, user=request.user).exists():
+            reviews = reviews or _reviews_context(request, id)
+            reviews_html = render_to_string('movies/show_reviews.html', {**reviews, 'user': request.user})
 
     template_data = {
-        'title': movie.name,
-        'movie': movie,
-        'reviews': reviews,
-        'user_rating': user_rating.value if user_rating else 0,
-        'avg_rating': movie.rate_movie(),
+        'title': page['title'],
+        'movie_id': page['movie_id'],
+        'summary_html': mark_safe(page['summary_html']),
+        'reviews_html': mark_safe(reviews_html),
+        'sidebar_html': mark_safe(page['sidebar_html']),
+        'user_rating': user_rating or 0,
     }
 
     return render(request, 'movies/show.html', {
@@ -101,110 +212,121 @@ def delete_review(request, id, review_id):
 # UPDATED FEATURE: Trending Movies
 # ------------------------------
 
-@login_required
-def trending_movies(request):
-    user = request.user
-    profile = getattr(user, "profile", None)
+def _state_name(state_param):
+    """The name "?state=" rollups are stored under, whatever its spelling or case."""
+    name = Region.name_for(regions.STATE, state_param)
+    # A region nobody has ordered from yet has no rollups to find either
+    return regions.canonical_name(regions.STATE, state_param) if name is None else name
 
-    state_param = request.GET.get("state")
 
-    if state_param:
-        filter_state = state_param
-        title = f"🎬 Trending Movies in {state_param}"
+def _trending_region(state, profile):
+    """Return (scope, region, title) for the trending page."""
+    if state:
+        return RegionalSales.SCOPE_STATE, state, f"🎬 Trending Movies in {state}"
     elif profile and profile.state:
-        filter_state = profile.state
-        title = "🎬 Trending Movies Near You"
+        return RegionalSales.SCOPE_STATE, profile.state, "🎬 Trending Movies Near You"
     elif profile and profile.country:
-        orders = Order.objects.filter(country=profile.country)
-        movie_counts = {}
-        for order in orders:
-            items = Item.objects.filter(order=order).select_related('movie')
-            for item in items:
-                movie = item.movie
-                if movie not in movie_counts:
-                    movie_counts[movie] = 0
-                movie_counts[movie] += item.quantity
-        
-        sorted_movies = sorted(movie_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        movies = [movie for movie, count in sorted_movies]
-        for movie in movies:
-            movie.purchase_count = movie_counts[movie]
-        
-        template_data = {
-            "title": "🎬 Trending Movies in Your Country",
-            "movies": movies,
-        }
-        return render(request, "movies/trending.html", {"template_data": template_data})
+        return RegionalSales.SCOPE_COUNTRY, profile.country, "🎬 Trending Movies in Your Country"
     else:
-        filter_state = None
-        title = "🎬 Trending Movies Overall"
+        return RegionalSales.SCOPE_OVERALL, '', "🎬 Trending Movies Overall"
 
-    if filter_state:
-        orders = Order.objects.filter(state=filter_state)
-    else:
-        orders = Order.objects.all()
-    
-    movie_counts = {}
-    for order in orders:
-        items = Item.objects.filter(order=order).select_related('movie')
-        for item in items:
-            movie = item.movie
-            if movie not in movie_counts:
-                movie_counts[movie] = 0
-            movie_counts[movie] += item.quantity
-    
-    sorted_movies = sorted(movie_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-    movies = [movie for movie, count in sorted_movies]
-    for movie in movies:
-        movie.purchase_count = movie_counts[movie]
-
-    template_data = {
-        "title": title,
-        "movies": movies,
-    }
 
-    return render(request, "movies/trending.html", {"template_data": template_data})
+def _trending_queries(scope, region, window):
+    """The page's independent queries as callables: regional top-N, overall top-N, review counts."""
+    if window in TRENDING_WINDOWS:
+        def top_movies(scope, region):
+            return TrendingScore.top_movies(scope, region, window)
 
-    # ✅ Aggregate trending movies (based on item count)
-    if filter_state:
-        movies = (
-            Movie.objects.filter(item__order__state=filter_state)
-            .annotate(
-                purchase_count=Sum('item__quantity'),
-                num_reviews=Count("review")
-            )
-            .order_by("-purchase_count")[:10]
-        )
+        def top_rows(scope, region):
+            return TrendingScore.top_rows(scope, region, window)
     else:
-        movies = (
-            Movie.objects.filter(item__isnull=False)
-            .annotate(
-                purchase_count=Sum('item__quantity'),
-                num_reviews=Count("review")
-            )
-            .order_by("-purchase_count")[:10]
+        top_movies = RegionalSales.top_movies
+        top_rows = RegionalSales.top_rows
+
+    def review_counts():
+        shown = (
+            Q(movie__in=top_rows(scope, region).values('movie_id'))
+            | Q(movie__in=top_rows(RegionalSales.SCOPE_OVERALL, '').values('movie_id'))
         )
+        rows = Review.objects.filter(shown).values('movie_id').annotate(total=Count('id')).order_by()
+        return {row['movie_id']: row['total'] for row in rows}
 
-    template_data = {
+    return (
+        lambda: top_movies(scope, region),
+        lambda: top_movies(RegionalSales.SCOPE_OVERALL, '') if scope != RegionalSales.SCOPE_OVERALL else [],
+        review_counts,
+    )
+
+
+def _trending_data(title, window, state_param, movies, overall_movies, num_reviews):
+    for movie in movies + overall_movies:
+        movie.num_reviews = num_reviews.get(movie.id, 0)
+    return {
         "title": title,
         "movies": movies,
+        "overall_movies": overall_movies,
+        "window": window,
+        "window_label": TRENDING_WINDOWS.get(window, "All time"),
+        "windows": TRENDING_WINDOWS.items(),
+        "state": state_param,
     }
 
+
+@read_from_replica
+@login_required
+def trending_movies(request):
+    user = request.user
+    profile = getattr(user, "profile", None)
+
+    state_param = request.GET.get("state")
+    scope, region, title = _trending_region(_state_name(state_param), profile)
+
+    window = request.GET.get("window")
+    if window not in TRENDING_WINDOWS:
+        window = None
+    movies, overall_movies, num_reviews = (query() for query in _trending_queries(scope, region, window))
+    template_data = _trending_data(title, window, state_param, movies, overall_movies, num_reviews)
+
     return render(request, "movies/trending.html", {"template_data": template_data})
 
 @login_required
 def rate_movie(request, id):
     if request.method != "POST":
         return HttpResponseBadRequest("Invalid method")
-    movie = get_object_or_404(Movie, pk=id)
     try:
         value = int(request.POST.get("rating", "0"))
     except ValueError:
         return HttpResponseBadRequest("Invalid rating")
     if value < 1 or value > 5:
         return HttpResponseBadRequest("Rating must be 1..5")
-    rating, _ = Rating.objects.get_or_create(user=request.user, movie=movie, defaults={"value": value})
-    if rating.value != value:
-        rating.value = value
-        rating.save(update_fields=["value", "updated_at"])
-    return redirect("movies.show", id=movie.id)
+    if settings.RATING_BUFFER_SECONDS:
+        rating_buffer.add(request.user.id, id, value)
+        note_write()
+    elif not Rating.upsert(request.user.id, id, value):
+        raise Http404("No movie matches the given query.")
+    return redirect("movies.show", id=id)
+
+
+# ------------------------------
+# Async (ASGI) variants
+# ------------------------------
+
+@read_from_replica
+async def trending_movies_async(request):
+    """trending_movies for ASGI: regional top-N, overall top-N and review counts run concurrently."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    profile = await UserProfile.objects.filter(user=user).afirst()
+
+    state_param = request.GET.get("state")
+    scope, region, title = _trending_region(await sync_to_async(_state_name)(state_param), profile)
+
+    window = request.GET.get("window")
+    if window not in TRENDING_WINDOWS:
+        window = None
+    movies, overall_movies, num_reviews = await gather_queries(*_trending_queries(scope, region, window))
+    template_data = _trending_data(title, window, state_param, movies, overall_movies, num_reviews)
+
+    # base.html reads request.user lazily, which queries the database
+    return await sync_to_async(render)(request, "movies/trending.html", {"template_data": template_data})
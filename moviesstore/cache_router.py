@@ -0,0 +1,28 @@
+"""Keep Django's database cache tables in a SQLite file of their own.
+
+The cache is shared by every worker and management command on the host, so a
+version bump or invalidation made in one process is seen by all of them, and
+cache writes never wait on the lock orders and ratings are written under.
+"""
+CACHE_DATABASE = 'cache'
+# app_label of django.core.cache.backends.db's CacheEntry model
+CACHE_APP = 'django_cache'
+
+
+class CacheRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == CACHE_APP:
+            return CACHE_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Answering before ReplicaRouter also keeps cache writes from pinning
+        # the session to the primary
+        return self.db_for_read(model, **hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == CACHE_APP:
+            return db == CACHE_DATABASE
+        if db == CACHE_DATABASE:
+            return False
+        return None
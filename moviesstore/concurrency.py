@@ -0,0 +1,48 @@
+"""Run independent ORM queries in parallel from async views.
+
+Django's async ORM methods run through sync_to_async(thread_sensitive=True),
+so every query of a request shares one thread and runs one after another.
+gather_queries() instead runs each callable in its own worker thread, with its
+own database connection, and closes that connection afterwards.
+
+Set CONCURRENT_QUERIES = False to run them sequentially on the request's
+connection instead; tests need this because worker-thread connections can't
+see data inside the test case's transaction.
+
+A connection.execute_wrapper only sees its own thread's connections, so
+anything that wraps a request's queries (the performance middleware) lists
+itself in `query_wrappers`, and each worker installs those on its own.
+"""
+import asyncio
+import contextlib
+import contextvars
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+query_wrappers = contextvars.ContextVar('query_wrappers', default=())
+
+
+def _closing_connections(func):
+    # Runs in the worker thread, in a copy of the request's context
+    def run():
+        try:
+            with contextlib.ExitStack() as stack:
+                for wrapper in query_wrappers.get():
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(wrapper))
+                return func()
+        finally:
+            connections.close_all()
+    return run
+
+
+async def gather_queries(*funcs):
+    """Call every zero-argument function concurrently and return their results in order."""
+    if not getattr(settings, 'CONCURRENT_QUERIES', True):
+        return [await sync_to_async(func)() for func in funcs]
+    return await asyncio.gather(*(
+        sync_to_async(_closing_connections(func), thread_sensitive=False)()
+        for func in funcs
+    ))
@@ -0,0 +1,192 @@
+"""Keyset (cursor) pagination.
+
+Instead of OFFSET, each page is fetched with a WHERE clause that starts right
+after the last row of the previous page. Where an index matches the ordering
+(movies by id, a movie's reviews and a user's orders by date) that is one
+range read, so deep pages cost the same as the first one. Orderings on
+computed values (the catalog's rating sorts, search rank) still compute and
+sort every candidate row per page; they only avoid OFFSET's skipped rows.
+The queryset's ordering must end in a unique column; ``id`` is appended when
+it doesn't.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldError, ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 12
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor, request, param, keep=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self._request = request
+        self._param = param
+        self._keep = keep
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_prev
+
+    def _url(self, cursor):
+        query = self._request.GET.copy() if self._request else None
+        if query is None:
+            return None
+        if self._keep is not None:
+            for name in list(query):
+                if name not in self._keep:
+                    del query[name]
+        query[self._param] = cursor
+        return '?' + query.urlencode()
+
+    @property
+    def next_url(self):
+        return self._url(self.next_cursor) if self.has_next else None
+
+    @property
+    def prev_url(self):
+        return self._url(self.prev_cursor) if self.has_prev else None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return parse_datetime(value['dt'])
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({'v': [_encode_value(v) for v in values], 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (values, direction), or (None, None) for a missing/garbled cursor."""
+    if not cursor:
+        return None, None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values = [_decode_value(v) for v in payload['v']]
+        direction = payload['d']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None, None
+    if direction not in ('n', 'p'):
+        return None, None
+    return values, direction
+
+
+def _normalize_ordering(queryset):
+    ordering = [str(field) for field in queryset.query.order_by]
+    names = [field.lstrip('-') for field in ordering]
+    if not ({'id', 'pk'} & set(names)):
+        ordering.append('id')
+    return ordering
+
+
+def _coerce(queryset, ordering, values):
+    """values converted to their ordering fields' types, or None if any of them doesn't fit.
+
+    Cursors come from the query string, so a tampered one must read as a
+    missing cursor rather than reach the database as a bad filter value.
+    """
+    if len(values) != len(ordering):
+        return None
+    query = queryset.query.clone()
+    coerced = []
+    for field, value in zip(ordering, values):
+        try:
+            output_field = query.resolve_ref(field.lstrip('-')).output_field
+            value = output_field.to_python(value)
+        except (FieldError, ValidationError, ValueError, TypeError):
+            return None
+        if value is None:
+            return None
+        coerced.append(value)
+    return coerced
+
+
+def _after(ordering, values):
+    """Q matching rows strictly after `values` in `ordering`."""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else '-' + field for field in ordering]
+
+
+def _values(obj, ordering):
+    return [getattr(obj, field.lstrip('-')) for field in ordering]
+
+
+def paginate(queryset, request=None, cursor=None, page_size=DEFAULT_PAGE_SIZE, param='cursor', keep=None):
+    """Fetch one page of `queryset` after/before `cursor` (read from request.GET[param] by default).
+
+    `keep` limits the query params carried over into the page links (all by
+    default); a page cached for several query strings must not link with one
+    visitor's extra params.
+    """
+    if cursor is None and request is not None:
+        cursor = request.GET.get(param)
+    ordering = _normalize_ordering(queryset)
+    values, direction = decode_cursor(cursor)
+    if values is not None:
+        values = _coerce(queryset, ordering, values)
+        if values is None:
+            direction = None
+
+    if direction == 'p':
+        rows = list(
+            queryset.filter(_after(_reverse(ordering), values))
+            .order_by(*_reverse(ordering))[:page_size + 1]
+        )
+        has_more_before = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        has_more_after = True
+    else:
+        if values is not None:
+            queryset = queryset.filter(_after(ordering, values))
+        rows = list(queryset.order_by(*ordering)[:page_size + 1])
+        items = rows[:page_size]
+        has_more_after = len(rows) > page_size
+        has_more_before = values is not None
+
+    next_cursor = prev_cursor = None
+    if items and has_more_after:
+        next_cursor = encode_cursor(_values(items[-1], ordering), 'n')
+    if items and has_more_before:
+        prev_cursor = encode_cursor(_values(items[0], ordering), 'p')
+    return KeysetPage(items, next_cursor, prev_cursor, request, param, keep)
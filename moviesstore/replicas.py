@@ -0,0 +1,143 @@
+"""Route read-only views to read replicas, with read-your-writes stickiness.
+
+Only views wrapped in @read_from_replica read from a replica; everything
+else, and every write, uses the default database. Replicas are listed in
+settings.REPLICA_DATABASES and may lag behind the primary, so:
+
+- a request that writes anything pins its session to the primary for
+  REPLICA_PIN_SECONDS, so the user who just checked out or rated sees it;
+- reads inside a transaction on the primary (select_for_update() and the
+  like) stay on the primary;
+- auth, session and contenttypes tables always come from the primary, so a
+  user who just signed up is not logged out by a stale replica;
+- anything stored in a cache every visitor shares is built inside
+  `with primary():`, so a version bump is never followed by a stale replica
+  rebuild cached under the new version.
+
+Locally a replica is a second SQLite file that `manage.py sync_replicas`
+copies the primary into.
+"""
+import contextlib
+import contextvars
+import functools
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_SESSION_KEY = '_replica_pin_until'
+PRIMARY_APPS = {'auth', 'contenttypes', 'sessions', 'admin'}
+
+
+class _RequestState:
+    # Mutated in place, so sync_to_async worker threads (which run in a copy
+    # of the context) report writes back to the request
+    def __init__(self):
+        self.use_replica = False
+        self.wrote = False
+
+
+_state = contextvars.ContextVar('replica_request_state', default=None)
+
+
+def replica_aliases():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.use_replica or state.wrote:
+            return None
+        if model._meta.app_label in PRIMARY_APPS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        aliases = replica_aliases()
+        return random.choice(aliases) if aliases else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly
+        return db not in replica_aliases()
+
+
+def note_write():
+    """Pin the current request's session as if it had written (for deferred writes)."""
+    state = _state.get()
+    if state is not None:
+        state.wrote = True
+
+
+@contextlib.contextmanager
+def primary():
+    """Read from the primary inside the block, even in a @read_from_replica view."""
+    state = _state.get()
+    if state is None or not state.use_replica:
+        yield
+        return
+    state.use_replica = False
+    try:
+        yield
+    finally:
+        state.use_replica = True
+
+
+def _pinned(request):
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def read_from_replica(view):
+    """Let a read-only view read from a replica unless the session is pinned."""
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            state = _state.get()
+            if state is not None:
+                state.use_replica = not await sync_to_async(_pinned)(request)
+            return await view(request, *args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            state = _state.get()
+            if state is not None:
+                state.use_replica = not _pinned(request)
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """Track writes per request and pin the session to the primary after one.
+
+    Must come after SessionMiddleware. Does nothing unless
+    settings.REPLICA_DATABASES is set.
+    """
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and hasattr(request, 'session'):
+            request.session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+        return response
@@ -20,6 +20,11 @@ load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
+# Per-view timing/query stats (see performance app); off unless set to 1
+PERFORMANCE_MONITORING = os.getenv("PERFORMANCE_MONITORING") == "1"
+# Number of recent requests per view kept for the rolling percentiles
+PERFORMANCE_WINDOW = int(os.getenv("PERFORMANCE_WINDOW", "500"))
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -36,6 +41,14 @@ DEBUG = True
 ALLOWED_HOSTS = ['*']
 
 
+# Half life of the "hot" trending score, in hours
+TRENDING_HALF_LIFE_HOURS = int(os.getenv("TRENDING_HALF_LIFE_HOURS", "72"))
+
+# Seconds to buffer ratings per process so rapid re-ratings are written once
+# (see movies/rating_buffer.py); 0 writes every rating immediately
+RATING_BUFFER_SECONDS = float(os.getenv("RATING_BUFFER_SECONDS", "0"))
+
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -50,11 +63,14 @@ INSTALLED_APPS = [
     'accounts',
     'cart',
     'popularitymap',
+    'performance',
 ]
 
 MIDDLEWARE = [
+    "performance.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "moviesstore.replicas.ReplicaMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -86,14 +102,85 @@ WSGI_APPLICATION = "moviesstore.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Test databases are files rather than shared-cache memory, so threads in
+# tests wait for SQLite's write lock as they do in the server instead of failing
 DATABASES = {
+    # DATABASE points at another file, e.g. a large seed_data set to benchmark
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "NAME": BASE_DIR / os.getenv("DATABASE", "db.sqlite3"),
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+    },
+    # Holds only the cache tables (see moviesstore/cache_router.py)
+    "cache": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / os.getenv("CACHE_DATABASE", "cache.sqlite3"),
+        "TEST": {"NAME": BASE_DIR / "test_cache.sqlite3"},
+    },
+}
+
+# Read replicas for read-only views (see moviesstore/replicas.py).
+# READ_REPLICAS is a comma-separated list of SQLite files, e.g.
+# READ_REPLICAS=db.replica.sqlite3, kept up to date by `manage.py sync_replicas`.
+REPLICA_DATABASES = []
+for number, path in enumerate(filter(None, os.getenv("READ_REPLICAS", "").split(",")), start=1):
+    alias = f"replica{number}"
+    DATABASES[alias] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / path.strip(),
+        "TEST": {"MIRROR": "default"},
     }
+    REPLICA_DATABASES.append(alias)
+
+DATABASE_ROUTERS = ["moviesstore.cache_router.CacheRouter", "moviesstore.replicas.ReplicaRouter"]
+
+# How long a session that wrote something keeps reading from the primary;
+# should cover the replicas' worst-case lag
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "60"))
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# The default cache holds versioned page fragments (their versions are rows in
+# the default database, see movies/caching.py) and the popularity map data,
+# so it has to be shared by every worker and management command: a database
+# cache in its own SQLite file (the "cache" database). `migrate` creates its
+# table.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
 }
 
 
+# Sessions (and the session cart) are stored in the database: a database
+# cache drops a write it can't make (e.g. while SQLite is locked), which a
+# session can't afford. SESSION_CACHE puts a cache in front for reads, with
+# every write still going through to the database:
+#   SESSION_CACHE=redis://127.0.0.1:6379/1  shared by every worker
+#   SESSION_CACHE=locmem                    per process, so only for a
+#                                           single worker (e.g. runserver)
+# https://docs.djangoproject.com/en/5.0/topics/http/sessions/#using-cached-sessions
+
+SESSION_ENGINE = "django.contrib.sessions.backends.db"
+SESSION_CACHE = os.getenv("SESSION_CACHE", "")
+if SESSION_CACHE:
+    CACHES["sessions"] = {
+        "BACKEND": (
+            "django.core.cache.backends.locmem.LocMemCache"
+            if SESSION_CACHE == "locmem"
+            else "django.core.cache.backends.redis.RedisCache"
+        ),
+        "LOCATION": SESSION_CACHE,
+        "TIMEOUT": 60 * 60 * 24 * 14,
+    }
+    SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+    SESSION_CACHE_ALIAS = "sessions"
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import router, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.utils.module_loading import import_string
+
+from movies.models import Movie
+
+from .replicas import PIN_SESSION_KEY, ReplicaMiddleware, _RequestState, _state, primary, read_from_replica
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    # Outside TestCase's wrapping transaction, which would keep every read on the primary
+    databases = {'default', 'cache'}
+
+    def setUp(self):
+        self.state = _RequestState()
+        token = _state.set(self.state)
+        self.addCleanup(_state.reset, token)
+
+    def request(self, pin_until=0):
+        request = RequestFactory().get('/movies/')
+        request.session = import_string(f'{settings.SESSION_ENGINE}.SessionStore')()
+        if pin_until:
+            request.session[PIN_SESSION_KEY] = pin_until
+        return request
+
+    def test_replica_views_read_from_a_replica_until_they_write(self):
+        self.state.use_replica = True
+        self.assertEqual(router.db_for_read(Movie), 'replica1')
+        self.assertEqual(router.db_for_write(Movie), 'default')
+        self.assertEqual(router.db_for_read(Movie), 'default')
+
+    def test_auth_tables_primary_blocks_and_transactions_read_the_primary(self):
+        self.assertEqual(router.db_for_read(Movie), 'default')
+        self.state.use_replica = True
+        self.assertEqual(router.db_for_read(User), 'default')
+        with primary():
+            self.assertEqual(router.db_for_read(Movie), 'default')
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Movie), 'default')
+        self.assertEqual(router.db_for_read(Movie), 'replica1')
+
+    def test_a_write_pins_the_session_and_a_pinned_session_skips_the_replica(self):
+        def rate(request):
+            router.db_for_write(Movie)
+            return HttpResponse()
+
+        request = self.request()
+        before = time.time()
+        ReplicaMiddleware(rate)(request)
+        self.assertGreaterEqual(request.session[PIN_SESSION_KEY], before + settings.REPLICA_PIN_SECONDS)
+
+        @read_from_replica
+        def catalog(request):
+            return HttpResponse(router.db_for_read(Movie))
+
+        middleware = ReplicaMiddleware(catalog)
+        self.assertEqual(middleware(request).content, b'default')
+        self.assertEqual(middleware(self.request(pin_until=time.time() - 1)).content, b'replica1')
@@ -26,7 +26,8 @@ urlpatterns = [
     path('movies/', include('movies.urls')),
     path('accounts/', include('accounts.urls')),
     path('cart/', include('cart.urls')),
-    path('popularity-map/', include('popularitymap.urls'))
+    path('popularity-map/', include('popularitymap.urls')),
+    path('performance/', include('performance.urls')),
 ]
 
 urlpatterns += static(
@@ -0,0 +1,7 @@
+from django.contrib import admin
+from .models import BackfillCheckpoint
+
+# Register your models here.
+@admin.register(BackfillCheckpoint)
+class BackfillCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('name', 'last_pk', 'high_water', 'rows', 'started_at', 'updated_at', 'finished_at')
@@ -0,0 +1,149 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import Region
+from cart import trending
+from cart.models import CoPurchase, Item, Order, RegionalSales
+from movies.models import Movie
+from performance.models import BackfillCheckpoint
+
+
+def _sales_source():
+    return Item.objects.values_list('pk', 'movie_id', 'quantity', 'order__state_region', 'order__country_region')
+
+
+def _sales_reset():
+    # Orders placed from here on are counted live by checkout and have a
+    # primary key above the high-water mark, so the backfill never adds them twice
+    RegionalSales.objects.all().delete()
+
+
+def _sales_apply(rows):
+    names = dict(Region.objects.values_list('id', 'name'))
+    totals = {}
+    for _, movie_id, quantity, state_id, country_id in rows:
+        for scope, region in trending.regions_for(names.get(state_id), names.get(country_id)):
+            key = (scope, region, movie_id)
+            totals[key] = totals.get(key, 0) + quantity
+    RegionalSales.add_totals(totals)
+
+
+def _ratings_source():
+    return Movie.objects.values_list('pk')
+
+
+def _ratings_apply(rows):
+    # Sets absolute counters per movie, so re-running a chunk is harmless
+    Movie.recompute_ratings([pk for pk, in rows])
+
+
+def _copurchase_source():
+    # Whole orders per chunk, so no order's pairs are split across chunks
+    return Order.objects.values_list('pk')
+
+
+def _copurchase_reset():
+    CoPurchase.objects.all().delete()
+
+
+def _copurchase_apply(rows):
+    CoPurchase.add_pairs(CoPurchase.count_orders([pk for pk, in rows]))
+
+
+# name: (source rows with the primary key first, reset before a fresh run, apply one chunk,
+#        whether --incremental may continue a finished run with newer rows)
+TARGETS = {
+    'sales': (_sales_source, _sales_reset, _sales_apply, False),
+    'ratings': (_ratings_source, None, _ratings_apply, False),
+    'copurchase': (_copurchase_source, _copurchase_reset, _copurchase_apply, True),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild precomputed aggregates (regional sales, movie rating counters, co-purchases) '
+        'from history in primary-key order, checkpointing after every chunk so an '
+        'interrupted run resumes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', metavar='target',
+                            help=f'Any of: {", ".join(sorted(TARGETS))} (default: all)')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--restart', action='store_true',
+                            help='Discard unfinished checkpoints and start over')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Only apply rows added since the last finished run (copurchase)')
+
+    def handle(self, *args, **options):
+        unknown = set(options['targets']) - set(TARGETS)
+        if unknown:
+            raise CommandError(f'Unknown target(s): {", ".join(sorted(unknown))}')
+        for name in options['targets'] or sorted(TARGETS):
+            try:
+                self.backfill(name, options['chunk_size'], options['restart'], options['incremental'])
+            except KeyboardInterrupt:
+                checkpoint = BackfillCheckpoint.objects.filter(name=name).first()
+                last_pk = checkpoint.last_pk if checkpoint else 0
+                self.stderr.write(f'{name}: interrupted after pk {last_pk}; run again to resume')
+                raise SystemExit(1)
+
+    def backfill(self, name, chunk_size, restart, incremental):
+        source, reset, apply, can_increment = TARGETS[name]
+        if incremental and not can_increment:
+            self.stdout.write(f'{name}: kept up to date as it changes; no incremental run needed')
+            return
+        checkpoint = BackfillCheckpoint.objects.filter(name=name).first()
+        if incremental and checkpoint and checkpoint.finished_at and not restart:
+            checkpoint.high_water = source().aggregate(high_water=Max('pk'))['high_water'] or 0
+            checkpoint.finished_at = None
+            checkpoint.save(update_fields=['high_water', 'finished_at', 'updated_at'])
+            self.stdout.write(f'{name}: applying rows after pk {checkpoint.last_pk}')
+        elif checkpoint is None or checkpoint.finished_at or restart:
+            with transaction.atomic():
+                high_water = source().aggregate(high_water=Max('pk'))['high_water'] or 0
+                if reset:
+                    reset()
+                checkpoint, _ = BackfillCheckpoint.objects.update_or_create(name=name, defaults={
+                    'high_water': high_water,
+                    'last_pk': 0,
+                    'rows': 0,
+                    'started_at': timezone.now(),
+                    'finished_at': None,
+                })
+        else:
+            self.stdout.write(f'{name}: resuming after pk {checkpoint.last_pk}')
+
+        remaining = source().filter(pk__gt=checkpoint.last_pk, pk__lte=checkpoint.high_water)
+        total = checkpoint.rows + remaining.count()
+        done = 0
+        start = time.perf_counter()
+        while True:
+            # One keyset slice per chunk rather than a single long-lived
+            # cursor: nothing stays open on the table while the chunk commits
+            rows = list(
+                source().filter(pk__gt=checkpoint.last_pk, pk__lte=checkpoint.high_water)
+                .order_by('pk')[:chunk_size]
+            )
+            if not rows:
+                break
+            with transaction.atomic():
+                apply(rows)
+                checkpoint.last_pk = rows[-1][0]
+                checkpoint.rows += len(rows)
+                checkpoint.save(update_fields=['last_pk', 'rows', 'updated_at'])
+            done += len(rows)
+            rate = done / (time.perf_counter() - start)
+            self.stdout.write(f'{name}: {checkpoint.rows}/{total} rows, {rate:,.0f} rows/s')
+
+        checkpoint.finished_at = timezone.now()
+        checkpoint.save(update_fields=['finished_at', 'updated_at'])
+        elapsed = time.perf_counter() - start
+        rate = done / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{name}: backfilled {done} rows in {elapsed:.1f}s ({rate:,.0f} rows/s)'
+        ))
@@ -0,0 +1,186 @@
+import json
+import re
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+from movies.models import Movie, Review
+from performance.middleware import QueryRecorder
+from performance.stats import percentile
+
+# Views that change state on GET or only accept POST
+SKIP = {
+    'accounts.logout', 'cart.add', 'cart.clear', 'cart.purchase',
+    'movies.create_review', 'movies.delete_review', 'movies.rate',
+    'performance.reset',
+}
+SERVER_TIMING_QUERIES = re.compile(r'(\d+) queries')
+
+
+def named_patterns(resolver=None, namespace=''):
+    """Yield (name, pattern) for every named, non-admin URL in the urlconf."""
+    resolver = resolver or get_resolver()
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.app_name == 'admin':
+                continue
+            yield from named_patterns(pattern, namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name, pattern
+
+
+class Command(BaseCommand):
+    help = 'Load-test every named URL and write throughput/latency/query stats as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Requests per URL')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--base-url', help='Hit a running server (e.g. http://127.0.0.1:8000) '
+                                              'instead of the in-process test client')
+        parser.add_argument('--user', help='Username to log in as (default: first synthetic user)')
+        parser.add_argument('--include', action='append', default=[], help='Only URL names containing this')
+        parser.add_argument('--exclude', action='append', default=[], help='Skip URL names containing this')
+        parser.add_argument('--output', default='benchmark_results.json')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        targets = self.targets(options['include'], options['exclude'])
+        if not targets:
+            raise CommandError('No URLs to benchmark')
+        session_cookie = None
+        if options['base_url'] and user:
+            client = Client()
+            client.force_login(user)
+            session_cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        results = {}
+        for name, url in targets:
+            if options['base_url']:
+                fetch = self.http_fetcher(options['base_url'].rstrip('/') + url, session_cookie)
+            else:
+                fetch = self.client_fetcher(url, user)
+            results[name] = self.run(fetch, options['requests'], options['concurrency'])
+            results[name]['url'] = url
+            self.report(name, results[name])
+
+        with open(options['output'], 'w') as output:
+            json.dump({
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'mode': 'http' if options['base_url'] else 'client',
+                'base_url': options['base_url'],
+                'requests_per_url': options['requests'],
+                'concurrency': options['concurrency'],
+                'user': user.username if user else None,
+                'results': results,
+            }, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def get_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {username}')
+        return User.objects.filter(username__startswith='synth_').order_by('id').first()
+
+    def targets(self, include, exclude):
+        movie = Movie.objects.order_by('-rating_count', 'id').first()
+        review = Review.objects.filter(movie=movie).first() if movie else None
+        sample_kwargs = {'id': movie.id if movie else None, 'review_id': review.id if review else None}
+        targets = []
+        for name, pattern in named_patterns():
+            if name in SKIP or (include and not any(i in name for i in include)):
+                continue
+            if any(e in name for e in exclude):
+                continue
+            kwargs = {key: sample_kwargs.get(key) for key in pattern.pattern.converters}
+            if None in kwargs.values():
+                continue
+            targets.append((name, reverse(name, kwargs=kwargs)))
+        return targets
+
+    def client_fetcher(self, url, user):
+        local = threading.local()
+
+        def fetch():
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                if user:
+                    local.client.force_login(user)
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = local.client.get(url)
+            return response.status_code, len(recorder.queries)
+        return fetch
+
+    def http_fetcher(self, url, session_cookie):
+        def fetch():
+            request = urllib.request.Request(url)
+            if session_cookie:
+                request.add_header('Cookie', session_cookie)
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    status, timing = response.status, response.headers.get('Server-Timing', '')
+            except urllib.error.HTTPError as error:
+                status, timing = error.code, error.headers.get('Server-Timing', '')
+            # Query counts are only known if the server runs PerformanceMiddleware
+            match = SERVER_TIMING_QUERIES.search(timing or '')
+            return status, int(match.group(1)) if match else None
+        return fetch
+
+    def run(self, fetch, count, concurrency):
+        def timed(_):
+            start = time.perf_counter()
+            try:
+                status, queries = fetch()
+            except Exception as error:
+                return (time.perf_counter() - start) * 1000, f'error: {type(error).__name__}', None
+            return (time.perf_counter() - start) * 1000, status, queries
+
+        fetch()  # warm up caches and connections
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(count)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(sample[0] for sample in samples)
+        queries = sorted(sample[2] for sample in samples if sample[2] is not None)
+        statuses = Counter(str(sample[1]) for sample in samples)
+        return {
+            'requests': count,
+            'errors': sum(n for status, n in statuses.items() if not status.startswith(('2', '3'))),
+            'status': dict(statuses),
+            'throughput_rps': round(count / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(statistics.fmean(latencies), 2),
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2),
+            },
+            'queries': {
+                'p50': percentile(queries, 50),
+                'max': queries[-1],
+            } if queries else None,
+        }
+
+    def report(self, name, result):
+        queries = result['queries']['p50'] if result['queries'] else '-'
+        self.stdout.write(
+            f'{name:<28} {result["throughput_rps"]:>8} req/s  '
+            f'p50 {result["latency_ms"]["p50"]:>8}ms  p95 {result["latency_ms"]["p95"]:>8}ms  '
+            f'p99 {result["latency_ms"]["p99"]:>8}ms  queries {queries}  errors {result["errors"]}'
+        )
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from performance.stats import percentile
+from .benchmark import Command as BenchmarkCommand
+
+# (sync WSGI view, async ASGI variant)
+PAIRS = [
+    ('movies.trending', 'movies.trending_async'),
+    ('popularitymap.data', 'popularitymap.data_async'),
+]
+
+
+def summarize(latencies, statuses, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(statistics.fmean(latencies), 2),
+            'p50': round(percentile(latencies, 50), 2),
+            'p95': round(percentile(latencies, 95), 2),
+            'p99': round(percentile(latencies, 99), 2),
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare sync (WSGI) views with their async (ASGI) variants under concurrent load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--query', default='', help='Query string to append, e.g. "window=7d"')
+        parser.add_argument('--user', help='Username to log in as (default: first synthetic user)')
+        parser.add_argument('--wsgi-url', help='Base URL of a WSGI server (e.g. gunicorn) to use instead '
+                                               'of the in-process handler')
+        parser.add_argument('--asgi-url', help='Base URL of an ASGI server (e.g. uvicorn); required with --wsgi-url')
+        parser.add_argument('--output', default='benchmark_asgi_results.json')
+
+    def handle(self, *args, **options):
+        if bool(options['wsgi_url']) != bool(options['asgi_url']):
+            raise CommandError('--wsgi-url and --asgi-url must be given together')
+        self.user = BenchmarkCommand().get_user(options['user'])
+        if self.user is None:
+            raise CommandError('No user to log in as; run seed_data or pass --user')
+        query = f'?{options["query"]}' if options['query'] else ''
+
+        results = {}
+        for sync_name, async_name in PAIRS:
+            sync_url, async_url = reverse(sync_name) + query, reverse(async_name) + query
+            if options['wsgi_url']:
+                sync_result = self.run_http(options['wsgi_url'].rstrip('/') + sync_url, options)
+                async_result = self.run_http(options['asgi_url'].rstrip('/') + async_url, options)
+            else:
+                sync_result = self.run_wsgi(sync_url, options['requests'], options['concurrency'])
+                async_result = asyncio.run(self.run_asgi(async_url, options['requests'], options['concurrency']))
+            results[sync_name] = {'wsgi': sync_result, 'asgi': async_result}
+            self.stdout.write(
+                f'{sync_name:<22} wsgi {sync_result["throughput_rps"]:>8} req/s p95 {sync_result["latency_ms"]["p95"]:>8}ms'
+                f' | asgi {async_result["throughput_rps"]:>8} req/s p95 {async_result["latency_ms"]["p95"]:>8}ms'
+            )
+
+        with open(options['output'], 'w') as output:
+            json.dump({
+                'timestamp': datetime.now(timezone.utc).isoformat(),
+                'mode': 'http' if options['wsgi_url'] else 'in-process',
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'query': options['query'],
+                'results': results,
+            }, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def run_wsgi(self, url, count, concurrency):
+        local = threading.local()
+
+        def timed(_):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+                local.client.force_login(self.user)
+            start = time.perf_counter()
+            status = local.client.get(url).status_code
+            return (time.perf_counter() - start) * 1000, status
+
+        timed(None)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(timed, range(count)))
+        elapsed = time.perf_counter() - started
+        return summarize([s[0] for s in samples], [s[1] for s in samples], elapsed)
+
+    async def run_asgi(self, url, count, concurrency):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                return (time.perf_counter() - start) * 1000, response.status_code
+
+        await client.get(url)  # warm up
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(timed() for _ in range(count)))
+        elapsed = time.perf_counter() - started
+        return summarize([s[0] for s in samples], [s[1] for s in samples], elapsed)
+
+    def run_http(self, url, options):
+        client = Client()
+        client.force_login(self.user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        fetch = BenchmarkCommand().http_fetcher(url, cookie)
+        result = BenchmarkCommand().run(fetch, options['requests'], options['concurrency'])
+        result.pop('queries', None)
+        result.pop('status', None)
+        return result
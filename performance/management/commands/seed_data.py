@@ -0,0 +1,251 @@
+import random
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts import regions
+from accounts.models import Region, UserProfile
+from cart.models import Item, Order, RegionalSales, TrendingScore
+from movies import recommendations
+from movies.caching import bump_catalog_version
+from movies.models import Movie, Rating, Review
+
+USER_PREFIX = 'synth_'
+MOVIE_PREFIX = 'Synthetic Movie '
+PASSWORD = 'synthetic-pass-123'
+
+# Rough population-style skew: a few big states dominate sales
+US_STATES = [
+    ('California', 39), ('Texas', 30), ('Florida', 22), ('New York', 20),
+    ('Pennsylvania', 13), ('Illinois', 12), ('Ohio', 12), ('Georgia', 11),
+    ('North Carolina', 10), ('Michigan', 10), ('New Jersey', 9), ('Virginia', 9),
+    ('Washington', 8), ('Arizona', 7), ('Massachusetts', 7), ('Tennessee', 7),
+    ('Indiana', 7), ('Colorado', 6), ('Oregon', 4), ('Nevada', 3),
+    ('Utah', 3), ('Iowa', 3), ('Kansas', 3), ('Maine', 1),
+    ('Vermont', 1), ('Wyoming', 1), ('Alaska', 1),
+]
+OTHER_COUNTRIES = [
+    ('Canada', 'Ontario', 5), ('Mexico', 'Jalisco', 3),
+    ('United Kingdom', '', 3), ('Japan', 'Tokyo', 2),
+]
+WORDS = (
+    'dream heist ship ocean love war space robot city night river storm secret '
+    'king queen ghost detective summer winter family road island empire shadow'
+).split()
+IMAGES = ['movie_images/avatar.jpg', 'movie_images/inception.jpg', 'movie_images/titanic.jpg']
+
+
+class Command(BaseCommand):
+    help = 'Generate a deterministic synthetic dataset for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=2340)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--movies', type=int, default=500)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--max-items', type=int, default=5, help='Max distinct movies per order')
+        parser.add_argument('--ratings', type=int, default=20000)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365, help='Spread order dates over this many days')
+        parser.add_argument('--international', type=float, default=0.1,
+                            help='Share of users outside the United States')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated synthetic users and movies first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+        if options['clear']:
+            self.clear()
+        users = self.create_users(options['users'], options['international'])
+        movies = self.create_movies(options['movies'])
+        if not users or not movies:
+            self.stdout.write(self.style.WARNING('Need at least one user and one movie'))
+            return
+        # Zipf-like popularity so a handful of titles dominate trending
+        movie_weights = [1 / (rank + 1) for rank in range(len(movies))]
+        self.create_orders(users, movies, movie_weights, options['orders'], options['max_items'], options['days'])
+        self.create_ratings(users, movies, movie_weights, options['ratings'])
+        self.create_reviews(users, movies, movie_weights, options['reviews'], options['days'])
+        # Orders were backdated after insert, so rebuild the time-windowed counters
+        TrendingScore.rebuild()
+        call_command('backfill_aggregates', 'copurchase', restart=True, stdout=StringIO())
+        recommendations.train()
+        # bulk_create bypasses the Movie signals that invalidate cached catalog pages
+        bump_catalog_version()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Synthetic dataset ready in {elapsed:.1f}s'))
+
+    def log(self, message):
+        self.stdout.write(message)
+
+    def clear(self):
+        deleted, _ = User.objects.filter(username__startswith=USER_PREFIX).delete()
+        deleted_movies, _ = Movie.objects.filter(name__startswith=MOVIE_PREFIX).delete()
+        # Rollups were built from the deleted orders; start them over
+        RegionalSales.objects.all().delete()
+        self.rebuild_regional_sales()
+        self.log(f'Cleared {deleted + deleted_movies} synthetic rows')
+
+    def pick_location(self, international):
+        if self.rng.random() < international:
+            country, state, _ = self.rng.choices(OTHER_COUNTRIES, [c[2] for c in OTHER_COUNTRIES])[0]
+            return state, country
+        state = self.rng.choices(US_STATES, [s[1] for s in US_STATES])[0][0]
+        return state, 'United States'
+
+    def create_users(self, count, international):
+        start = User.objects.filter(username__startswith=USER_PREFIX).count()
+        password = make_password(PASSWORD)
+        users = [
+            User(username=f'{USER_PREFIX}{start + i}', password=password)
+            for i in range(count)
+        ]
+        with transaction.atomic():
+            self.state_regions = regions.resolve(
+                Region, regions.STATE, [state for state, _ in US_STATES] + [state for _, state, _ in OTHER_COUNTRIES]
+            )
+            self.country_regions = regions.resolve(
+                Region, regions.COUNTRY, ['United States'] + [country for country, _, _ in OTHER_COUNTRIES]
+            )
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+            users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('id'))
+            # bulk_create skips the post_save signal that normally makes profiles
+            existing = {
+                user_id: (state, country)
+                for user_id, state, country in UserProfile.objects.filter(user__in=users)
+                .values_list('user_id', 'state', 'country')
+            }
+            profiles = []
+            for user in users:
+                if user.id in existing:
+                    user.location = existing[user.id]
+                    continue
+                user.location = self.pick_location(international)
+                state, country = user.location
+                profiles.append(UserProfile(
+                    user=user,
+                    state=state,
+                    country=country,
+                    state_region=self.state_regions.get(state),
+                    country_region=self.country_regions.get(country),
+                ))
+            UserProfile.objects.bulk_create(profiles, batch_size=self.batch_size)
+        self.log(f'Users: {count} created, {len(users)} synthetic total')
+        return users
+
+    def create_movies(self, count):
+        start = Movie.objects.filter(name__startswith=MOVIE_PREFIX).count()
+        movies = []
+        for i in range(start, start + count):
+            words = self.rng.sample(WORDS, 3)
+            movies.append(Movie(
+                name=f'{MOVIE_PREFIX}{i}: {" ".join(words[:2]).title()}',
+                price=self.rng.randint(5, 30),
+                description=f'A story about {words[0]}, {words[1]} and {words[2]}. ' * 3,
+                image=IMAGES[i % len(IMAGES)],
+            ))
+        with transaction.atomic():
+            Movie.objects.bulk_create(movies, batch_size=self.batch_size)
+        movies = list(Movie.objects.order_by('id'))
+        self.log(f'Movies: {count} created, {len(movies)} total')
+        return movies
+
+    def create_orders(self, users, movies, movie_weights, count, max_items, days):
+        now = timezone.now()
+        created = 0
+        while created < count:
+            chunk = min(self.batch_size, count - created)
+            orders, lines = [], []
+            for _ in range(chunk):
+                user = self.rng.choice(users)
+                state, country = user.location
+                picked = {
+                    movie.id: movie
+                    for movie in self.rng.choices(movies, movie_weights, k=self.rng.randint(1, max_items))
+                }
+                order_lines = [(movie, self.rng.choice((1, 1, 1, 2, 3))) for movie in picked.values()]
+                orders.append(Order(
+                    user=user,
+                    state=state,
+                    country=country,
+                    state_region=self.state_regions.get(state),
+                    country_region=self.country_regions.get(country),
+                    total=sum(movie.price * quantity for movie, quantity in order_lines),
+                ))
+                lines.append(order_lines)
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                # auto_now_add overwrote the dates; spread them out afterwards
+                for order in orders:
+                    order.date = now - timedelta(seconds=self.rng.randint(0, days * 86400))
+                Order.objects.bulk_update(orders, ['date'])
+                items = []
+                sales = {}
+                for order, order_lines in zip(orders, lines):
+                    region = sales.setdefault((order.state, order.country), {})
+                    for movie, quantity in order_lines:
+                        items.append(Item(order=order, movie=movie, price=movie.price, quantity=quantity))
+                        region[movie.id] = region.get(movie.id, 0) + quantity
+                Item.objects.bulk_create(items)
+                for (state, country), quantities in sales.items():
+                    RegionalSales.record(state, country, quantities)
+            created += chunk
+            self.log(f'Orders: {created}/{count}')
+
+    def create_ratings(self, users, movies, movie_weights, count):
+        taken = set(Rating.objects.values_list('user_id', 'movie_id'))
+        count = min(count, len(users) * len(movies) - len(taken))
+        ratings = []
+        while len(ratings) < count:
+            user = self.rng.choice(users)
+            movie = self.rng.choices(movies, movie_weights)[0]
+            if (user.id, movie.id) in taken:
+                continue
+            taken.add((user.id, movie.id))
+            ratings.append(Rating(user=user, movie=movie, value=self.rng.choices(range(1, 6), (1, 1, 3, 5, 4))[0]))
+        with transaction.atomic():
+            Rating.objects.bulk_create(ratings, batch_size=self.batch_size)
+            Movie.recompute_ratings(batch_size=self.batch_size)
+        self.log(f'Ratings: {len(ratings)} created')
+
+    def create_reviews(self, users, movies, movie_weights, count, days):
+        now = timezone.now()
+        reviews = [
+            Review(
+                user=self.rng.choice(users),
+                movie=self.rng.choices(movies, movie_weights)[0],
+                comment=' '.join(self.rng.choices(WORDS, k=12)).capitalize() + '.',
+            )
+            for _ in range(count)
+        ]
+        with transaction.atomic():
+            Review.objects.bulk_create(reviews, batch_size=self.batch_size)
+            for review in reviews:
+                review.date = now - timedelta(seconds=self.rng.randint(0, days * 86400))
+            Review.objects.bulk_update(reviews, ['date'], batch_size=self.batch_size)
+        self.log(f'Reviews: {count} created')
+
+    def rebuild_regional_sales(self):
+        names = dict(Region.objects.values_list('id', 'name'))
+        sales = {}
+        rows = (
+            Item.objects.values('order__state_region', 'order__country_region', 'movie_id')
+            .annotate(quantity=Sum('quantity'))
+            .order_by()
+        )
+        for row in rows:
+            region = sales.setdefault((row['order__state_region'], row['order__country_region']), {})
+            region[row['movie_id']] = row['quantity']
+        for (state_id, country_id), quantities in sales.items():
+            RegionalSales.record(names.get(state_id), names.get(country_id), quantities)
@@ -0,0 +1,53 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into every local read replica (READ_REPLICAS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        aliases = settings.REPLICA_DATABASES
+        if not aliases:
+            raise CommandError('No replicas configured; set READ_REPLICAS')
+        for alias in [DEFAULT_DB_ALIAS] + aliases:
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(
+                    f'{alias} is not SQLite; use the database\'s own replication instead'
+                )
+
+        while True:
+            start = time.perf_counter()
+            for alias in aliases:
+                self.sync(alias)
+            self.stdout.write(self.style.SUCCESS(
+                f'Synced {len(aliases)} replica(s) in {time.perf_counter() - start:.2f}s'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, alias):
+        # The backup API takes a consistent snapshot while checkout keeps
+        # writing. It goes to a temporary file that is then renamed over the
+        # replica, so readers never see a half-copied database: open
+        # connections keep the old file and new ones get the new one.
+        path = str(connections[alias].settings_dict['NAME'])
+        temp_path = f'{path}.sync'
+        primary = connections[DEFAULT_DB_ALIAS]
+        primary.ensure_connection()
+        target = sqlite3.connect(temp_path)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        connections[alias].close()
+        os.replace(temp_path, path)
@@ -0,0 +1,119 @@
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template
+
+from moviesstore.concurrency import query_wrappers
+
+from .stats import count_repeats, request_stats
+
+# Template time of the request currently being measured (None when not measuring)
+_template_ms = contextvars.ContextVar('performance_template_ms', default=None)
+_template_patched = False
+
+
+def _patch_template_render():
+    """Time top-level template renders; {% include %}s are part of their parent."""
+    global _template_patched
+    if _template_patched:
+        return
+    original_render = Template.render
+
+    def timed_render(self, context=None, request=None):
+        elapsed = _template_ms.get()
+        if elapsed is None:
+            return original_render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original_render(self, context, request)
+        finally:
+            _template_ms.set(_template_ms.get() + (time.perf_counter() - start) * 1000)
+
+    Template.render = timed_render
+    _template_patched = True
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that times and keeps every statement.
+
+    Thread-safe: gather_queries() installs it in its worker threads too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = []
+        self.db_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.db_ms += elapsed
+                self.queries.append((sql, _hashable(params)))
+
+
+def _hashable(params):
+    if params is None:
+        return None
+    try:
+        hash(tuple(params))
+        return tuple(params)
+    except TypeError:
+        return repr(params)
+
+
+class PerformanceMiddleware:
+    """Record wall time, query count/time, repeated queries and template time per view.
+
+    Opt-in: does nothing unless settings.PERFORMANCE_MONITORING is true.
+    Results are available at performance.index / performance.data and in a
+    Server-Timing response header.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_MONITORING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _patch_template_render()
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        token = _template_ms.set(0.0)
+        wrappers_token = query_wrappers.set(query_wrappers.get() + (recorder,))
+        wrappers = [connection.execute_wrapper(recorder) for connection in connections.all()]
+        start = time.perf_counter()
+        try:
+            for wrapper in wrappers:
+                wrapper.__enter__()
+            response = self.get_response(request)
+        finally:
+            wall_ms = (time.perf_counter() - start) * 1000
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            template_ms = _template_ms.get()
+            _template_ms.reset(token)
+            query_wrappers.reset(wrappers_token)
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else '<unresolved>'
+        duplicate, similar, top_repeated = count_repeats(recorder.queries)
+        request_stats.record(view, {
+            'wall_ms': wall_ms,
+            'queries': len(recorder.queries),
+            'db_ms': recorder.db_ms,
+            'duplicate_queries': duplicate,
+            'similar_queries': similar,
+            'template_ms': template_ms,
+        }, top_repeated)
+        response['Server-Timing'] = (
+            f'total;dur={wall_ms:.1f}, db;dur={recorder.db_ms:.1f};desc="{len(recorder.queries)} queries", '
+            f'tpl;dur={template_ms:.1f}'
+        )
+        return response
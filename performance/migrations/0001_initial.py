@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-18 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackfillCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('high_water', models.BigIntegerField(help_text='Last source primary key included in this run')),
+                ('last_pk', models.BigIntegerField(default=0, help_text='Last source primary key already applied')),
+                ('rows', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
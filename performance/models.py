@@ -0,0 +1,16 @@
+from django.db import models
+
+# Create your models here.
+class BackfillCheckpoint(models.Model):
+    """Progress of a backfill_aggregates run, saved in the same transaction as each chunk."""
+    name = models.CharField(max_length=50, unique=True)
+    high_water = models.BigIntegerField(help_text='Last source primary key included in this run')
+    last_pk = models.BigIntegerField(default=0, help_text='Last source primary key already applied')
+    rows = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        state = 'done' if self.finished_at else f'at pk {self.last_pk}/{self.high_water}'
+        return f'{self.name} ({state})'
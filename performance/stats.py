@@ -0,0 +1,80 @@
+import threading
+from collections import Counter, defaultdict, deque
+
+from django.conf import settings
+
+METRICS = ('wall_ms', 'queries', 'db_ms', 'duplicate_queries', 'similar_queries', 'template_ms')
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def count_repeats(queries):
+    """Return (duplicate, similar, top_repeated) for a list of (sql, params).
+
+    Duplicates repeat the same SQL with the same parameters; similar queries
+    repeat the same SQL with any parameters (the usual N+1 signature).
+    """
+    exact = Counter(queries)
+    shapes = Counter(sql for sql, _ in queries)
+    duplicate = sum(count - 1 for count in exact.values() if count > 1)
+    similar = sum(count - 1 for count in shapes.values() if count > 1)
+    top_repeated = [(sql, count) for sql, count in shapes.most_common(3) if count > 1]
+    return duplicate, similar, top_repeated
+
+
+class RequestStats:
+    """Rolling window of per-request samples, grouped by URL name."""
+
+    def __init__(self, window=None):
+        self.window = window or getattr(settings, 'PERFORMANCE_WINDOW', 500)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._samples = defaultdict(lambda: {m: deque(maxlen=self.window) for m in METRICS})
+        self._totals = Counter()
+        self._repeated = {}
+
+    def record(self, view, sample, top_repeated=None):
+        with self._lock:
+            samples = self._samples[view]
+            for metric in METRICS:
+                samples[metric].append(sample[metric])
+            self._totals[view] += 1
+            if top_repeated:
+                self._repeated[view] = top_repeated
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def report(self):
+        """Return {view: {'requests': n, metric: {'p50':..,'p95':..,'p99':..,'max':..}}}."""
+        with self._lock:
+            snapshot = {
+                view: {metric: sorted(values) for metric, values in samples.items()}
+                for view, samples in self._samples.items()
+            }
+            totals = dict(self._totals)
+            repeated = dict(self._repeated)
+        report = {}
+        for view, samples in sorted(snapshot.items()):
+            entry = {'requests': totals[view], 'window': len(samples['wall_ms'])}
+            for metric, values in samples.items():
+                entry[metric] = {f'p{p}': round(percentile(values, p), 2) for p in PERCENTILES}
+                entry[metric]['max'] = round(values[-1], 2) if values else 0.0
+            entry['repeated_sql'] = [
+                {'sql': sql, 'count': count} for sql, count in repeated.get(view, [])
+            ]
+            report[view] = entry
+        return report
+
+
+request_stats = RequestStats()
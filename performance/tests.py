@@ -0,0 +1,138 @@
+import re
+from io import StringIO
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from movies.models import Movie, Review
+from moviesstore.concurrency import gather_queries, query_wrappers
+from performance.management.commands.benchmark import named_patterns
+from performance.middleware import QueryRecorder
+
+# Create your tests here.
+
+# Maximum number of queries each named URL may run for a logged-in staff user
+# against the seeded dataset. A view missing from this table fails the suite,
+# so new views have to declare a budget.
+QUERY_BUDGETS = {
+    'home.index': 5,
+    'home.about': 2,
+    'movies.index': 7,
+    'movies.show': 8,
+    'movies.create_review': 3,
+    'movies.edit_review': 5,
+    'movies.delete_review': 7,
+    'movies.rate': 2,
+    'movies.trending': 6,
+    'movies.trending_async': 7,
+    'movies.api_list': 2,
+    'movies.api_detail': 4,
+    'accounts.signup': 2,
+    'accounts.login': 2,
+    'accounts.logout': 4,
+    'accounts.orders': 4,
+    'cart.index': 3,
+    'cart.add': 3,
+    'cart.clear': 4,
+    'cart.checkout': 4,
+    'cart.purchase': 2,
+    'cart.export': 3,
+    'popularitymap.index': 2,
+    'popularitymap.data': 2,
+    'popularitymap.data_async': 2,
+    'popularitymap.states': 2,
+    'performance.index': 2,
+    'performance.data': 2,
+    'performance.reset': 2,
+}
+
+# Tables that grow with sales/activity and must never be read with a full scan
+WATCHED_TABLES = ('cart_order', 'cart_item', 'movies_review', 'movies_rating')
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?({})\b'.format('|'.join(WATCHED_TABLES)))
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+# Bulk exports read every matching row by design
+FULL_SCAN_ALLOWED = {'cart.export'}
+
+
+@override_settings(CONCURRENT_QUERIES=False)
+class QueryPlanTests(TestCase):
+    """Run every named URL, enforce its query budget and EXPLAIN every statement."""
+    # Views read and fill the shared cache, which has a database of its own
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=30, movies=40, orders=300, ratings=300, reviews=200,
+            stdout=StringIO(),
+        )
+        cls.user = User.objects.filter(username__startswith='synth_').order_by('id').first()
+        cls.user.is_staff = True
+        cls.user.save()
+        cls.movie = Movie.objects.order_by('-rating_count', 'id').first()
+        cls.review = Review.objects.create(movie=cls.movie, user=cls.user, comment='Great')
+
+    def url_for(self, name, pattern):
+        kwargs = {
+            key: {'id': self.movie.id, 'review_id': self.review.id}[key]
+            for key in pattern.pattern.converters
+        }
+        return reverse(name, kwargs=kwargs)
+
+    def run_view(self, url):
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('cart.add', kwargs={'id': self.movie.id}), {'quantity': 1})
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        return response, recorder.queries
+
+    def full_scans(self, queries):
+        scans = []
+        with connection.cursor() as cursor:
+            for sql, params in queries:
+                if not sql.lstrip().upper().startswith(EXPLAINABLE):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params or ())
+                for row in cursor.fetchall():
+                    if FULL_SCAN.search(row[-1]):
+                        scans.append(f'{row[-1]}  <-  {sql}')
+        return scans
+
+    def test_every_url_within_budget_and_without_full_scans(self):
+        patterns = list(named_patterns())
+        self.assertTrue(patterns)
+        for name, pattern in patterns:
+            with self.subTest(url=name):
+                self.assertIn(name, QUERY_BUDGETS, f'{name} has no query budget')
+                url = self.url_for(name, pattern)
+                with transaction.atomic():
+                    response, queries = self.run_view(url)
+                    self.assertLess(response.status_code, 500)
+                    self.assertLessEqual(
+                        len(queries), QUERY_BUDGETS[name],
+                        f'{name} ran {len(queries)} queries:\n' + '\n'.join(sql for sql, _ in queries),
+                    )
+                    if name not in FULL_SCAN_ALLOWED:
+                        scans = self.full_scans(queries)
+                        self.assertEqual(scans, [], f'{name} fully scans a watched table')
+                    transaction.set_rollback(True)
+
+
+class GatherQueriesRecordingTests(TestCase):
+    @override_settings(CONCURRENT_QUERIES=True)
+    def test_worker_thread_queries_reach_the_request_recorder(self):
+        recorder = QueryRecorder()
+        token = query_wrappers.set((recorder,))
+        try:
+            async_to_sync(gather_queries)(Movie.objects.count, Review.objects.count)
+        finally:
+            query_wrappers.reset(token)
+        self.assertEqual(len(recorder.queries), 2)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.index, name='performance.index'),
+    path('data/', views.data, name='performance.data'),
+    path('reset/', views.reset, name='performance.reset'),
+]
@@ -0,0 +1,27 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+from .stats import METRICS, request_stats
+
+# Create your views here.
+
+@staff_member_required
+def index(request):
+    template_data = {}
+    template_data['title'] = 'Performance'
+    template_data['metrics'] = METRICS
+    template_data['window'] = request_stats.window
+    template_data['report'] = request_stats.report()
+    return render(request, 'performance/index.html', {'template_data': template_data})
+
+@staff_member_required
+def data(request):
+    return JsonResponse({'window': request_stats.window, 'views': request_stats.report()})
+
+@staff_member_required
+@require_POST
+def reset(request):
+    request_stats.clear()
+    return redirect('performance.index')
@@ -0,0 +1,145 @@
+"""Simplified, precompressed state outlines for the popularity map.
+
+build() turns the source GeoJSON into a much smaller one: Douglas-Peucker
+simplification, coordinates rounded to PRECISION decimals, only the `name`
+property kept, no whitespace. It then writes gzip and (when the brotli
+package is installed) brotli copies next to it. The states view serves
+whichever of those the browser accepts, under a content-hashed URL that can
+be cached forever.
+"""
+import gzip
+import hashlib
+import json
+import os
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'moviesstore', 'static', 'data')
+SOURCE = os.path.join(DATA_DIR, 'us-states.json')
+OUTPUT = os.path.join(DATA_DIR, 'us-states.min.json')
+# Degrees: 0.01 (about 1 km) for coordinates, and outlines may stray 0.05
+# from the original, under a pixel at the map's initial zoom of 4
+PRECISION = 2
+TOLERANCE = 0.05
+# (Content-Encoding, file suffix), best first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _distance(point, start, end):
+    """Distance from point to the segment start-end, in degrees."""
+    (x, y), (x1, y1), (x2, y2) = point, start, end
+    dx, dy = x2 - x1, y2 - y1
+    if dx == dy == 0:
+        return ((x - x1) ** 2 + (y - y1) ** 2) ** 0.5
+    t = max(0, min(1, ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)))
+    return ((x - x1 - t * dx) ** 2 + (y - y1 - t * dy) ** 2) ** 0.5
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker, iteratively so long rings can't exhaust the stack."""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        farthest, index = 0, None
+        for i in range(first + 1, last):
+            distance = _distance(points[i], points[first], points[last])
+            if distance > farthest:
+                farthest, index = distance, i
+        if index is not None and farthest > tolerance:
+            keep[index] = True
+            stack.extend([(first, index), (index, last)])
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_ring(ring, tolerance, precision):
+    """A closed ring simplified and rounded, or None once it is too small to draw."""
+    points = []
+    for x, y in simplify_line(ring, tolerance):
+        point = [round(x, precision), round(y, precision)]
+        if not points or point != points[-1]:
+            points.append(point)
+    # First and last point are the same, so a triangle needs four
+    return points if len(points) >= 4 else None
+
+
+def _simplify_polygon(rings, tolerance, precision):
+    simplified = [simplify_ring(ring, tolerance, precision) for ring in rings]
+    if simplified[0] is None:
+        return None
+    return [simplified[0]] + [ring for ring in simplified[1:] if ring]
+
+
+def simplify(collection, tolerance=TOLERANCE, precision=PRECISION):
+    """Return a simplified copy of a GeoJSON FeatureCollection of (Multi)Polygons."""
+    features = []
+    for feature in collection['features']:
+        geometry = feature['geometry']
+        if geometry['type'] == 'Polygon':
+            polygons = [geometry['coordinates']]
+        else:
+            polygons = geometry['coordinates']
+        # Keep at least the largest polygon, however small, so no state disappears
+        kept = [
+            polygon for polygon in (_simplify_polygon(rings, tolerance, precision) for rings in polygons)
+            if polygon
+        ] or [_simplify_polygon(max(polygons, key=lambda rings: len(rings[0])), 0, precision)]
+        features.append({
+            'type': 'Feature',
+            'properties': {'name': feature['properties']['name']},
+            'geometry': (
+                {'type': 'Polygon', 'coordinates': kept[0]} if len(kept) == 1
+                else {'type': 'MultiPolygon', 'coordinates': kept}
+            ),
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def build(source=SOURCE, output=OUTPUT, tolerance=TOLERANCE, precision=PRECISION):
+    """Write output and its compressed copies; returns {path: size in bytes}."""
+    with open(source, encoding='utf-8') as file:
+        collection = json.load(file)
+    data = json.dumps(simplify(collection, tolerance, precision), separators=(',', ':')).encode()
+    files = {output: data, output + '.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        files[output + '.br'] = brotli.compress(data, quality=11)
+    elif os.path.exists(output + '.br'):
+        # A stale brotli copy would be served instead of the new outline
+        os.remove(output + '.br')
+    for path, content in files.items():
+        with open(path, 'wb') as file:
+            file.write(content)
+    version.cache_clear()
+    return {path: len(content) for path, content in files.items()}
+
+
+@lru_cache(maxsize=1)
+def version():
+    """Hash of the built asset (None if build() never ran); part of its URL."""
+    try:
+        with open(OUTPUT, 'rb') as file:
+            return hashlib.md5(file.read()).hexdigest()[:12]
+    except FileNotFoundError:
+        return None
+
+
+def variant(accept_encoding):
+    """Return (path, Content-Encoding or None) of the best copy the client accepts."""
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    for encoding, suffix in ENCODINGS:
+        if encoding in accepted and os.path.exists(OUTPUT + suffix):
+            return OUTPUT + suffix, encoding
+    return OUTPUT, None
@@ -0,0 +1,24 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from popularitymap import geometry
+
+
+class Command(BaseCommand):
+    help = 'Build the simplified, precompressed state outlines the popularity map loads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tolerance', type=float, default=geometry.TOLERANCE,
+                            help='How far (in degrees) simplified outlines may stray from the source')
+        parser.add_argument('--precision', type=int, default=geometry.PRECISION,
+                            help='Decimal places kept in coordinates')
+
+    def handle(self, *args, **options):
+        source_size = os.path.getsize(geometry.SOURCE)
+        sizes = geometry.build(tolerance=options['tolerance'], precision=options['precision'])
+        for path, size in sizes.items():
+            self.stdout.write(f'{os.path.basename(path)}: {size:,} bytes ({size / source_size:.0%} of the source)')
+        if geometry.brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed; only gzip copies were written'))
+        self.stdout.write(self.style.SUCCESS(f'Map assets built (version {geometry.version()})'))
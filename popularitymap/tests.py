@@ -1,3 +1,30 @@
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts import regions
+from accounts.models import Region
+from cart.models import RegionalSales
+from movies.models import Movie
 
 # Create your tests here.
+
+
+class PopularityDataTests(TestCase):
+    databases = {'default', 'cache'}
+
+    @classmethod
+    def setUpTestData(cls):
+        movie = Movie.objects.create(name='Heat', price=10, description='Heist')
+        Region.resolve(regions.STATE, 'Ontario')
+        RegionalSales.objects.create(scope='state', region='Ontario', movie=movie, quantity=2)
+
+    def test_any_spelling_reads_the_stored_region(self):
+        for spelling in ['Ontario', 'ontario', ' ONTARIO ']:
+            with self.subTest(spelling=spelling):
+                response = self.client.get(reverse('popularitymap.data'), {'state': spelling})
+                self.assertEqual(response.json(), {'Ontario': [{'movie': 'Heat', 'count': 2}]})
+
+    def test_unknown_region_is_empty_and_not_created(self):
+        response = self.client.get(reverse('popularitymap.data'), {'state': 'Atlantis'})
+        self.assertEqual(response.json(), {'Atlantis': []})
+        self.assertFalse(Region.objects.filter(key='atlantis').exists())
@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='popularitymap.index'),
+    path('data/', views.data, name='popularitymap.data'),
+    path('data/async/', views.data_async, name='popularitymap.data_async'),
+    path('states.json', views.states, name='popularitymap.states'),
 ]
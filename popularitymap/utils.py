@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db.models import Max
+
+from cart.models import Order, RegionalSales
+
+# Cached data is invalidated explicitly at checkout, in the cache every
+# process shares; the timeout is a backstop for writes made outside checkout.
+CACHE_TIMEOUT = 60 * 5
+DATA_KEY = 'popularitymap:data'
+STATE_KEY = 'popularitymap:state:{}'
+LATEST_ORDER_KEY = 'popularitymap:latest_order'
+
+NO_DATA = {
+    'No Data': [
+        {'movie': 'No purchases yet', 'count': 0},
+    ]
+}
+
+
+def _state_key(state):
+    # Cache keys must not contain spaces or control characters.
+    return STATE_KEY.format(state.strip().lower().replace(' ', '_'))
+
+
+def build_popularity_data(state=None):
+    """Return {state: [{'movie': name, 'count': n}, ...]} sorted by count."""
+    rows = (
+        RegionalSales.objects.filter(scope=RegionalSales.SCOPE_STATE, quantity__gt=0)
+        .order_by('region', '-quantity', 'movie__name')
+        .values_list('region', 'movie__name', 'quantity')
+    )
+    if state is not None:
+        rows = rows.filter(region=state)
+    formatted_data = {}
+    for region, movie_name, quantity in rows:
+        formatted_data.setdefault(region, []).append({'movie': movie_name, 'count': quantity})
+    return formatted_data
+
+
+def get_popularity_data():
+    data = cache.get(DATA_KEY)
+    if data is None:
+        data = build_popularity_data() or NO_DATA
+        cache.set(DATA_KEY, data, CACHE_TIMEOUT)
+    return data
+
+
+def get_state_popularity(state):
+    key = _state_key(state)
+    data = cache.get(key)
+    if data is None:
+        data = build_popularity_data(state).get(state, [])
+        cache.set(key, data, CACHE_TIMEOUT)
+    return data
+
+
+def latest_order():
+    """Return (id, date) of the newest order with a state, or None if there are none."""
+    marker = cache.get(LATEST_ORDER_KEY)
+    if marker is None:
+        # Blank states never resolve to a region; a range (rather than IS NOT
+        # NULL) lets SQLite use the state_region index
+        located = Order.objects.filter(state_region__gt=0)
+        result = located.aggregate(latest_id=Max('id'), latest_date=Max('date'))
+        marker = (result['latest_id'], result['latest_date'])
+        cache.set(LATEST_ORDER_KEY, marker, CACHE_TIMEOUT)
+    return marker if marker[0] is not None else None
+
+
+def invalidate_popularity_data(order):
+    """Drop cached map data affected by a newly placed order."""
+    if not order.state:
+        return
+    cache.delete_many([DATA_KEY, _state_key(order.state)])
+    cache.set(LATEST_ORDER_KEY, (order.id, order.date), CACHE_TIMEOUT)
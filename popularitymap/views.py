@@ -1,53 +1,118 @@
-import json
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, Http404, JsonResponse
+from django.templatetags.static import static
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers, quote_etag
+from django.utils.http import http_date
 from django.shortcuts import render
 from django.conf import settings
-from django.db.models import Count, Q
-from cart.models import Order, Item
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from accounts import regions
+from accounts.models import Region
+from moviesstore.concurrency import gather_queries
+from . import geometry
+from .utils import get_popularity_data, get_state_popularity, latest_order
 
 # Create your views here.
 def index(request):
     template_data = {}
     template_data['google_api_key'] = settings.GOOGLE_API_KEY
+    version = geometry.version()
+    # The unsimplified source until build_map_assets has been run
+    template_data['states_url'] = (
+        f"{reverse('popularitymap.states')}?v={version}" if version else static('data/us-states.json')
+    )
+    return render(request, 'popularitymap/index.html', {'template_data': template_data})
 
-    # Get actual popularity data from orders
-    popularity_data = {}
-    
-    # Get all orders with state and country information
-    orders_with_location = Order.objects.filter(
-        Q(state__isnull=False) & ~Q(state__exact='')
-    ).select_related('user')
-    
-    # Group orders by state and count movie purchases
-    for order in orders_with_location:
-        state = order.state
-        if state not in popularity_data:
-            popularity_data[state] = {}
-        
-        # Get all items in this order
-        items = Item.objects.filter(order=order).select_related('movie')
-        for item in items:
-            movie_name = item.movie.name
-            if movie_name not in popularity_data[state]:
-                popularity_data[state][movie_name] = 0
-            popularity_data[state][movie_name] += item.quantity
-    
-    # Convert to the format expected by the frontend and sort by count
-    formatted_data = {}
-    for state, movies in popularity_data.items():
-        # Convert to list of dictionaries and sort by count (descending)
-        movie_list = [{'movie': movie, 'count': count} for movie, count in movies.items()]
-        movie_list.sort(key=lambda x: x['count'], reverse=True)
-        formatted_data[state] = movie_list
-    
-    # If no real data exists, show a message or empty data
-    if not formatted_data:
-        # You can add some sample data for demonstration or leave empty
-        formatted_data = {
-            'No Data': [
-                {'movie': 'No purchases yet', 'count': 0},
-            ]
-        }
-
-    template_data['popularity_data'] = json.dumps(formatted_data)
-
-    return render(request, 'popularitymap/index.html', {'template_data': template_data})
\ No newline at end of file
+
+@require_GET
+def states(request):
+    """Simplified state outlines, precompressed; cacheable forever when ?v= is the current build."""
+    version = geometry.version()
+    if version is None:
+        raise Http404('Map outlines have not been built; run build_map_assets')
+    path, encoding = geometry.variant(request.headers.get('Accept-Encoding', ''))
+    # filename: what the client ends up with once it has decoded the body
+    response = FileResponse(open(path, 'rb'), content_type='application/geo+json', filename='us-states.json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    if request.GET.get('v') == version:
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=60 * 5)
+    return response
+
+
+def _state_param(request):
+    """Return (state, known): "?state=ca" or "?state=california" reads the stored "California"."""
+    # Looked up once per request; the ETag needs it as well as the view
+    if not hasattr(request, '_popularity_state'):
+        value = request.GET.get('state')
+        name = Region.name_for(regions.STATE, value)
+        # A region that doesn't exist has no counts and gets no cache entry
+        request._popularity_state = (
+            (regions.canonical_name(regions.STATE, value), False) if name is None else (name, True)
+        )
+    return request._popularity_state
+
+
+def _etag_for(marker, state):
+    if marker is None:
+        return f'empty-{state}'
+    return f'{marker[0]}-{marker[1].timestamp()}-{state}'
+
+
+def _data_etag(request):
+    return _etag_for(latest_order(), _state_param(request)[0])
+
+
+def _data_last_modified(request):
+    marker = latest_order()
+    return marker[1] if marker else None
+
+
+# Not @read_from_replica: the ETag marker and the payload both live in the
+# shared cache, so both are built from the primary that checkout writes to
+@require_GET
+@cache_control(no_cache=True)
+@condition(etag_func=_data_etag, last_modified_func=_data_last_modified)
+def data(request):
+    """Per-state purchase counts for the map, revalidated with ETag/Last-Modified."""
+    state, known = _state_param(request)
+    if state:
+        return JsonResponse({state: get_state_popularity(state) if known else []})
+    return JsonResponse(get_popularity_data())
+
+
+async def data_async(request):
+    """data() for ASGI; the freshness marker and the payload are read concurrently."""
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    state, known = await sync_to_async(_state_param)(request)
+
+    def payload():
+        if state:
+            return {state: get_state_popularity(state) if known else []}
+        return get_popularity_data()
+
+    if request.headers.get('If-None-Match') or request.headers.get('If-Modified-Since'):
+        # Revalidation: most of these end in a 304, so don't build the payload up front
+        marker = await sync_to_async(latest_order)()
+        body = None
+    else:
+        marker, body = await gather_queries(latest_order, payload)
+
+    etag = quote_etag(_etag_for(marker, state))
+    last_modified = int(marker[1].timestamp()) if marker else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        if body is None:
+            body = await sync_to_async(payload)()
+        response = JsonResponse(body)
+    response.headers.setdefault('ETag', etag)
+    if last_modified:
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+    patch_cache_control(response, no_cache=True)
+    return response